@@ -0,0 +1,101 @@
+import hashlib
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+def version_key(model):
+    return f"version:{model._meta.label_lower}"
+
+
+def new_version():
+    """Версия начинается со времени её создания."""
+    return f"{time.time():.6f}-{uuid4().hex}"
+
+
+def get_version(model):
+    """Текущая версия данных модели.
+
+    С общим кэшем версия одна для всех процессов. С кэшем в памяти
+    процесса смена версии в другом процессе (load_csv, другой worker)
+    сюда не доходит, поэтому версия живёт VERSION_CACHE_TIMEOUT секунд.
+    """
+    return cache.get_or_set(
+        version_key(model), new_version, settings.VERSION_CACHE_TIMEOUT)
+
+
+def get_version_time(model):
+    """Время, не раньше которого данные модели изменились последний раз.
+
+    Версия без времени (записанная до его появления в ключе) считается
+    созданной сейчас: ответ тогда просто не будет 304.
+    """
+    try:
+        return float(get_version(model).split("-")[0])
+    except ValueError:
+        return time.time()
+
+
+def bump_version(model):
+    cache.set(version_key(model), new_version(),
+              settings.VERSION_CACHE_TIMEOUT)
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(
+        ":".join(str(part) for part in parts).encode()
+    ).hexdigest())
+
+
+def not_modified(request, etag, last_modified=None):
+    """Ответ 304 (или 412) на условный запрос, иначе None."""
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    response = Response(headers=headers)
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=last_modified, response=response)
+    if conditional is response:
+        return None
+    return conditional
+
+
+class CachedResponseMixin:
+    """Кэширует сериализованные ответы list и retrieve.
+
+    В ключ входит версия модели, поэтому любое изменение модели
+    делает старые ответы недоступными. Ответ отдаётся с ETag,
+    на совпадающий If-None-Match возвращается 304.
+    """
+
+    def cached_response(self, request, get_response):
+        model = self.queryset.model
+        # Путь с параметрами запроса может быть любой длины, а memcached
+        # принимает ключи не длиннее 250 символов.
+        key = (f"response:{model._meta.label_lower}:{get_version(model)}:"
+               + hashlib.md5(request.get_full_path().encode()).hexdigest())
+        cached = cache.get(key)
+        if cached is None:
+            data = get_response().data
+            cached = (data, make_etag(JSONRenderer().render(data)))
+            cache.set(key, cached, settings.REFERENCE_CACHE_TIMEOUT)
+        data, etag = cached
+        response = Response(data, headers={"ETag": etag})
+        return get_conditional_response(request, etag=etag,
+                                        response=response)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(CachedResponseMixin, self).list(
+                request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(CachedResponseMixin, self).retrieve(
+                request, *args, **kwargs))
@@ -0,0 +1,105 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+def resolve_pks(queryset, pks):
+    """Загружает объекты по списку ключей одним запросом id__in.
+
+    Возвращает словарь {pk: объект} и список ключей, которых нет в базе.
+    """
+    objects = queryset.in_bulk(set(pks))
+    missing = [pk for pk in pks if pk not in objects]
+    return objects, missing
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Первичный ключ, который разрешается в объект пакетно.
+
+    Само поле только приводит значение к типу ключа, без запроса к базе.
+    Объекты загружает родитель: BulkManyRelatedField для many=True
+    или BulkListSerializer для вложенного сериализатора.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_internal_value(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+    def does_not_exist(self, pk):
+        return self.error_messages["does_not_exist"].format(pk_value=pk)
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Список первичных ключей, загружаемый одним запросом."""
+
+    def to_internal_value(self, data):
+        pks = super().to_internal_value(data)
+        child = self.child_relation
+        objects, missing = resolve_pks(child.get_queryset(), pks)
+        if missing:
+            raise serializers.ValidationError(
+                [child.does_not_exist(pk) for pk in missing]
+            )
+        return [objects[pk] for pk in pks]
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """Список вложенных объектов с пакетной загрузкой связей.
+
+    Ключи из полей BulkPrimaryKeyRelatedField дочернего сериализатора
+    загружаются одним запросом на поле, ошибки по всем отсутствующим
+    ключам возвращаются сразу.
+    """
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        errors = [{} for _ in items]
+        for field in self.child.fields.values():
+            if (not isinstance(field, BulkPrimaryKeyRelatedField)
+                    or field.read_only):
+                continue
+            pks = [
+                item[field.source] for item in items if field.source in item
+            ]
+            objects, missing = resolve_pks(field.get_queryset(), pks)
+            for item, item_errors in zip(items, errors):
+                pk = item.get(field.source)
+                if pk is None:
+                    continue
+                if pk in objects:
+                    item[field.source] = objects[pk]
+                else:
+                    item_errors[field.field_name] = [field.does_not_exist(pk)]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+
+class ImageVariantField(serializers.ImageField):
+    """Ссылка на вариант изображения рецепта.
+
+    Пока фоновая обработка не создала вариант, отдаётся оригинал.
+    """
+
+    def __init__(self, fallback="image", **kwargs):
+        self.fallback = fallback
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return (super().get_attribute(instance)
+                or getattr(instance, self.fallback))
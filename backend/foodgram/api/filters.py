@@ -1,34 +1,94 @@
 import django_filters
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.cache import cache
+from django.db.models import Exists, F, OuterRef
+from rest_framework.filters import OrderingFilter
 
-from recipes.models import User, Recipe, Tag, Ingredient
+from api.cache import get_version
+from recipes.models import SEARCH_CONFIG, User, Recipe, Tag, Ingredient
+
+
+def get_tag_ids():
+    """Словарь slug -> id тегов, общий для всех процессов.
+
+    Ключ содержит версию Tag, поэтому изменение тегов сразу
+    даёт новый словарь.
+    """
+    return cache.get_or_set(
+        f"tag_ids:{get_version(Tag)}",
+        lambda: dict(Tag.objects.values_list("slug", "id")),
+        settings.REFERENCE_CACHE_TIMEOUT,
+    )
+
+
+def tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
 
 
 class RecipeFilter(django_filters.FilterSet):
-    tags = django_filters.ModelMultipleChoiceFilter(
-        field_name="tags__slug",
-        to_field_name="slug",
-        queryset=Tag.objects.all(),
+    tags = django_filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method="tags_filter",
     )
     author = django_filters.ModelChoiceFilter(queryset=User.objects.all())
+    search = django_filters.CharFilter(method="search_filter")
     is_favorited = django_filters.NumberFilter(method="is_favorited_filter")
     is_in_shopping_cart = django_filters.NumberFilter(
         method="is_in_shopping_cart_filter")
 
     class Meta:
         model = Recipe
-        fields = ("tags", "author", "is_favorited", "is_in_shopping_cart")
+        fields = ("tags", "author", "is_favorited", "is_in_shopping_cart",
+                  "search")
+
+    def tags_filter(self, queryset, name, value):
+        if not value:
+            return queryset
+        tag_ids = get_tag_ids()
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef("pk"),
+            tag_id__in=[tag_ids[slug] for slug in value if slug in tag_ids],
+        )))
+
+    def search_filter(self, queryset, name, value):
+        query = SearchQuery(value, config=SEARCH_CONFIG,
+                            search_type="websearch")
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F("search_vector"), query))
 
     def is_favorited_filter(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(favorite_recipe__user=self.request.user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def is_in_shopping_cart_filter(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(shopping_list__user=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
 
 
+class RecipeOrderingFilter(OrderingFilter):
+    """При поиске без явного ordering сортирует по релевантности.
+
+    К выбранной сортировке добавляется id в том же направлении:
+    у счётчиков много равных значений, и без уникального последнего
+    поля страницы повторяли бы и пропускали рецепты.
+    """
+    search_ordering = ("-search_rank", "-id")
+
+    def get_ordering(self, request, queryset, view):
+        if (request.query_params.get("search")
+                and not request.query_params.get(self.ordering_param)):
+            return self.search_ordering
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and "id" not in {
+                field.lstrip("-") for field in ordering}:
+            ordering = (*ordering,
+                        "-id" if ordering[-1].startswith("-") else "id")
+        return ordering
+
+
 class IngredientFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(lookup_expr="istartswith")
 
@@ -0,0 +1,46 @@
+import bisect
+
+from api.cache import get_version
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса.
+
+    Названия хранятся в отсортированном списке в нижнем регистре:
+    совпадения по началу названия ищутся бинарным поиском,
+    совпадения по вхождению добавляются после них.
+    Индекс перестраивается при изменении версии Ingredient.
+    """
+
+    def __init__(self):
+        self._data = None
+
+    def build(self, version):
+        items = sorted(
+            Ingredient.objects.values("id", "name", "measurement_unit"),
+            key=lambda item: (item["name"].casefold(), item["id"])
+        )
+        keys = [item["name"].casefold() for item in items]
+        self._data = (version, keys, items)
+        return self._data
+
+    def search(self, query, limit=None):
+        version = get_version(Ingredient)
+        data = self._data
+        if data is None or data[0] != version:
+            data = self.build(version)
+        _, keys, items = data
+        query = query.casefold()
+        start = bisect.bisect_left(keys, query)
+        end = bisect.bisect_left(keys, query + chr(0x10FFFF), lo=start)
+        result = items[start:end]
+        if limit is None or len(result) < limit:
+            result += [
+                item for key, item in zip(keys, items)
+                if query in key and not key.startswith(query)
+            ]
+        return result[:limit]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,48 @@
+import random
+import time
+
+from django.core.management import BaseCommand
+
+from api.ingredient_index import ingredient_index
+from api.serializers import IngredientSerializer
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = "Сравнение поиска ингредиентов через ORM и индекс в памяти."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queries", type=int, default=500)
+        parser.add_argument("--limit", type=int, default=None)
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list("name", flat=True))
+        if not names:
+            self.stderr.write("Нет ингредиентов, выполните load_csv.")
+            return
+        random.seed(0)
+        queries = [
+            random.choice(names)[:random.randint(1, 4)]
+            for _ in range(options["queries"])
+        ]
+        limit = options["limit"]
+
+        def orm_search(query):
+            queryset = Ingredient.objects.filter(name__istartswith=query)
+            if limit:
+                queryset = queryset[:limit]
+            return IngredientSerializer(queryset, many=True).data
+
+        ingredient_index.search("")
+        for title, search in (
+            ("orm", orm_search),
+            ("index", lambda query: ingredient_index.search(query, limit)),
+        ):
+            start = time.perf_counter()
+            for query in queries:
+                search(query)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{title:<6} {elapsed / len(queries) * 1e6:>10.1f} "
+                f"мкс/запрос"
+            )
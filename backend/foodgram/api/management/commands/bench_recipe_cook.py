@@ -0,0 +1,53 @@
+import random
+
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast
+
+from api.management.commands.bench_recipe_search import (
+    Command as SearchBenchmark
+)
+from api.utils import match_recipes
+from recipes.models import Ingredient, Recipe, User
+
+
+class Command(SearchBenchmark):
+    help = ("Сравнение подбора рецептов по имеющимся ингредиентам: "
+            "индекс (ingredient, recipe) против соединений по всем "
+            "рецептам.")
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--have", type=int, default=10)
+        parser.add_argument("--limit", type=int, default=10)
+
+    def handle(self, *args, **options):
+        author = User.objects.order_by("pk").first()
+        ingredients = list(Ingredient.objects.all())
+        if author is None or len(ingredients) < options["have"]:
+            self.stderr.write("Нужны пользователь и ингредиенты (load_csv).")
+            return
+        random.seed(0)
+        limit = options["limit"]
+        with transaction.atomic():
+            self.create_recipes(author, ingredients, options)
+            ingredient_ids = [ingredient.pk for ingredient in ingredients]
+            queries = [
+                set(random.sample(ingredient_ids, options["have"]))
+                for _ in range(options["queries"])
+            ]
+
+            def naive(have):
+                return list(Recipe.objects.annotate(
+                    matched=Count("recipe_ingredients", filter=Q(
+                        recipe_ingredients__ingredient__in=have)),
+                    total=Count("recipe_ingredients"),
+                ).filter(matched__gt=0).annotate(
+                    coverage=Cast("matched", FloatField()) / F("total")
+                ).order_by("-coverage", "-id")[:limit])
+
+            self.measure("index", lambda have: match_recipes(have, limit),
+                         queries)
+            self.measure("naive", naive, queries)
+            if not options["keep"]:
+                transaction.set_rollback(True)
@@ -0,0 +1,105 @@
+import heapq
+import random
+
+from django.db import connection, transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.management.commands.bench_recipe_search import (
+    Command as SearchBenchmark
+)
+from api.paginations import FeedCursorPagination
+from recipes.models import Recipe, Subscription, User
+
+
+class Command(SearchBenchmark):
+    help = ("Сравнение ленты подписок одним запросом с загрузкой "
+            "рецептов каждого автора отдельным запросом.")
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--authors", type=int, default=2000)
+        parser.add_argument(
+            "--following", type=int, nargs="+", default=(10, 100, 1000))
+        parser.add_argument("--pages", type=int, default=20)
+
+    def create_feed(self, options):
+        authors = User.objects.bulk_create(
+            User(username=f"bench_author_{number}",
+                 email=f"bench_author_{number}@example.com")
+            for number in range(options["authors"])
+        )
+        # Активность авторов неравномерна: у первых рецептов больше всего.
+        weights = [1 / (rank + 1) for rank in range(len(authors))]
+        for offset in range(0, options["recipes"], options["batch_size"]):
+            size = min(options["batch_size"], options["recipes"] - offset)
+            Recipe.objects.bulk_create(
+                Recipe(author=author, name=f"bench feed {offset + number}",
+                       image_processed=True)
+                for number, author in enumerate(
+                    random.choices(authors, weights, k=size))
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {Recipe._meta.db_table} SET pub_date = "
+                f"now() - random() * interval '365 days' "
+                f"WHERE name LIKE 'bench feed %%'"
+            )
+            cursor.execute(f"ANALYZE {Recipe._meta.db_table}")
+        followers = []
+        for following in options["following"]:
+            follower = User.objects.create(
+                username=f"bench_follower_{following}",
+                email=f"bench_follower_{following}@example.com",
+            )
+            Subscription.objects.bulk_create(
+                Subscription(user=follower, author=author)
+                for author in random.sample(authors, following)
+            )
+            followers.append(follower)
+        return followers
+
+    def feed_page(self, follower, url):
+        """Страница ленты через FeedCursorPagination, как в API."""
+        request = Request(APIRequestFactory(SERVER_NAME="localhost").get(url))
+        request.user = follower
+        paginator = FeedCursorPagination()
+        paginator.paginate_queryset(Recipe.objects.all(), request)
+        return paginator.get_next_link()
+
+    def per_author(self, follower):
+        """Первая страница так, как её собирает клиент сейчас:
+        запрос /recipes/?author= на каждого автора."""
+        page_size = FeedCursorPagination.page_size
+        return heapq.nlargest(page_size, (
+            recipe
+            for author_id in Subscription.objects.filter(
+                user=follower).values_list("author_id", flat=True)
+            for recipe in Recipe.objects.filter(author_id=author_id)
+            .order_by("-pub_date", "-id")
+            .values_list("pub_date", "id")[:page_size]
+        ))
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        with transaction.atomic():
+            followers = self.create_feed(options)
+            for follower in followers:
+                urls = ["/api/recipes/feed/"]
+                while len(urls) < options["pages"]:
+                    url = self.feed_page(follower, urls[-1])
+                    if url is None:
+                        break
+                    urls.append(url)
+                self.stdout.write(
+                    f"Подписок: {follower.follower.count()}, "
+                    f"страниц ленты: {len(urls)}"
+                )
+                self.measure(
+                    "feed",
+                    lambda url: self.feed_page(follower, url),
+                    urls,
+                )
+                self.measure("per-author", self.per_author, [follower] * 5)
+            if not options["keep"]:
+                transaction.set_rollback(True)
@@ -0,0 +1,111 @@
+import random
+import statistics
+import time
+
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from api.filters import RecipeFilter
+from recipes.models import Ingredient, Recipe, RecipeIngredients, User
+
+
+class Command(BaseCommand):
+    help = ("Сравнение полнотекстового поиска рецептов с icontains "
+            "на синтетических данных.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=300000)
+        parser.add_argument("--ingredients", type=int, default=5)
+        parser.add_argument("--queries", type=int, default=50)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Не удалять созданные рецепты после замеров.",
+        )
+
+    def create_recipes(self, author, ingredients, options):
+        words = [
+            word for ingredient in ingredients
+            for word in ingredient.name.lower().split() if len(word) > 3
+        ]
+        start = time.perf_counter()
+        for offset in range(0, options["recipes"], options["batch_size"]):
+            size = min(options["batch_size"], options["recipes"] - offset)
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    author=author,
+                    name=f"bench {offset + number} "
+                         f"{' '.join(random.sample(words, 2))}",
+                    text=" ".join(random.sample(words, 12)),
+                    cooking_time=random.randint(5, 120),
+                    image_processed=True,
+                )
+                for number in range(size)
+            )
+            RecipeIngredients.objects.bulk_create(
+                RecipeIngredients(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    amount=random.randint(1, 500),
+                    recipe_ingredients_count=options["ingredients"],
+                )
+                for recipe in recipes
+                for ingredient in random.sample(
+                    ingredients, options["ingredients"])
+            )
+        Recipe.objects.filter(
+            name__startswith="bench ").update_search_vector()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE recipes_recipe")
+            cursor.execute("ANALYZE recipes_recipeingredients")
+        self.stdout.write(
+            f"Создано рецептов: {options['recipes']} "
+            f"за {time.perf_counter() - start:.1f} с."
+        )
+        return words
+
+    def measure(self, title, search, queries):
+        """Медиана и максимум времени search по всем запросам."""
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            search(query)
+            timings.append(time.perf_counter() - start)
+        self.stdout.write(
+            f"{title:<10} median {statistics.median(timings) * 1000:>9.2f} "
+            f"ms  max {max(timings) * 1000:>9.2f} ms"
+        )
+
+    def handle(self, *args, **options):
+        author = User.objects.order_by("pk").first()
+        ingredients = list(Ingredient.objects.all())
+        if author is None or len(ingredients) < options["ingredients"]:
+            self.stderr.write("Нужны пользователь и ингредиенты (load_csv).")
+            return
+        random.seed(0)
+        with transaction.atomic():
+            words = self.create_recipes(author, ingredients, options)
+            queries = random.sample(words, options["queries"])
+            search = RecipeFilter().search_filter
+
+            # Страница вместе с подсчётом, как в списке рецептов.
+            def page(queryset, ordering):
+                return (queryset.count(),
+                        list(queryset.order_by(*ordering)[:10]))
+
+            def full_text(query):
+                return page(search(Recipe.objects.all(), "search", query),
+                            ("-search_rank", "-id"))
+
+            def icontains(query):
+                return page(Recipe.objects.filter(
+                    Q(name__icontains=query) | Q(text__icontains=query)
+                    | Q(ingredients__name__icontains=query)
+                ).distinct(), ("-pub_date", "-id"))
+
+            self.measure("fts", full_text, queries)
+            self.measure("icontains", icontains, queries)
+            if not options["keep"]:
+                transaction.set_rollback(True)
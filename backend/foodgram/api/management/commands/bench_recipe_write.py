@@ -0,0 +1,84 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.serializers import RecipeSerializer
+from recipes.images import delete_image_files
+from recipes.models import Ingredient, Recipe, Tag, User
+
+PNG = (
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQ"
+    "GAhKmMIQAAAABJRU5ErkJggg=="
+)
+
+
+class Command(BaseCommand):
+    help = "Время и число запросов при создании и изменении рецептов."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", nargs="+", type=int, default=[5, 30, 100])
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def payload(self, ingredient_ids, tag_ids, amount):
+        return {
+            "name": "bench",
+            "text": "bench",
+            "cooking_time": 10,
+            "image": f"data:image/png;base64,{PNG}",
+            "tags": tag_ids,
+            "ingredients": [
+                {"id": pk, "amount": amount} for pk in ingredient_ids
+            ],
+        }
+
+    def measure(self, serializer):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            serializer.is_valid(raise_exception=True)
+            recipe = serializer.save(author=self.author)
+            elapsed = time.perf_counter() - start
+        return recipe, elapsed, len(queries)
+
+    def handle(self, *args, **options):
+        self.author = User.objects.order_by("pk").first()
+        tag_ids = list(Tag.objects.values_list("pk", flat=True))
+        if self.author is None or not tag_ids:
+            self.stderr.write("Нужны хотя бы один пользователь и тег.")
+            return
+        self.stdout.write(
+            f"{'op':<7} {'items':>6} {'ms':>10} {'queries':>8}")
+        for size in options["sizes"]:
+            ingredient_ids = list(
+                Ingredient.objects.values_list("pk", flat=True)[:size * 2])
+            if len(ingredient_ids) < size * 2:
+                self.stderr.write(f"Недостаточно ингредиентов для {size}.")
+                continue
+            results = {"create": [], "update": []}
+            for _ in range(options["repeat"]):
+                with transaction.atomic():
+                    recipe, elapsed, queries = self.measure(RecipeSerializer(
+                        data=self.payload(ingredient_ids[:size], tag_ids, 1)
+                    ))
+                    results["create"].append((elapsed, queries))
+                    half = size // 2
+                    # FieldFile.delete() обнуляет поле у своего рецепта,
+                    # поэтому первое изображение удаляется через копию.
+                    created = Recipe(image=recipe.image.name)
+                    recipe, elapsed, queries = self.measure(RecipeSerializer(
+                        recipe,
+                        data=self.payload(
+                            ingredient_ids[half:half + size], tag_ids[:1], 2)
+                    ))
+                    results["update"].append((elapsed, queries))
+                    delete_image_files(created)
+                    delete_image_files(recipe)
+                    transaction.set_rollback(True)
+            for operation, timings in results.items():
+                elapsed, queries = min(timings)
+                self.stdout.write(
+                    f"{operation:<7} {size:>6} "
+                    f"{elapsed * 1000:>10.2f} {queries:>8}"
+                )
@@ -0,0 +1,56 @@
+import io
+import time
+import tracemalloc
+
+from django.core.management import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.shopping_list import (
+    iter_csv,
+    iter_text,
+    render_pdf,
+    to_json
+)
+
+RENDERERS = {
+    "pdf": lambda rows: render_pdf(rows, io.BytesIO()),
+    "txt": lambda rows: "".join(iter_text(rows)),
+    "csv": lambda rows: "".join(iter_csv(rows)),
+    "json": lambda rows: JSONRenderer().render(to_json(rows)),
+}
+
+
+class Command(BaseCommand):
+    help = "Сравнение времени и памяти форматов списка покупок."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", nargs="+", type=int, default=[10, 100, 1000])
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'format':<6} {'items':>6} {'ms':>10} {'peak KiB':>10}")
+        for size in options["sizes"]:
+            shopping_list = [
+                {
+                    "ingredient__name": f"ингредиент {number}",
+                    "ingredient__measurement_unit": "г",
+                    "amount": number,
+                }
+                for number in range(size)
+            ]
+            for file_format, render in RENDERERS.items():
+                timings = []
+                for _ in range(options["repeat"]):
+                    start = time.perf_counter()
+                    render(shopping_list)
+                    timings.append(time.perf_counter() - start)
+                tracemalloc.start()
+                render(shopping_list)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.stdout.write(
+                    f"{file_format:<6} {size:>6} "
+                    f"{min(timings) * 1000:>10.2f} {peak / 1024:>10.1f}"
+                )
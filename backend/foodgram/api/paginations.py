@@ -1,7 +1,216 @@
+import hashlib
+
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connection
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.settings import api_settings
+
+from api.utils import get_subscribed_ids
+
+
+def estimate_count(model):
+    """Оценка числа строк таблицы по статистике PostgreSQL."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    return row[0] if row else -1
+
+
+class LookaheadPage(Page):
+    """Страница, у которой наличие следующей определено лишней
+    строкой выборки, а не по count."""
+
+    def __init__(self, object_list, number, paginator, has_following):
+        super().__init__(object_list, number, paginator)
+        self.has_following = has_following
+
+    def has_next(self):
+        return self.has_following
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который не считает COUNT(*) на каждый запрос.
+
+    Для запроса без фильтров к большой таблице берётся оценка
+    из pg_class, иначе точный count кэшируется по тексту запроса
+    на COUNT_CACHE_TIMEOUT секунд. Приблизительный count попадает только
+    в ответ: страница выбирается с одной лишней строкой, поэтому
+    устаревшее значение не обрезает выдачу и ссылку next.
+    """
+    count_is_exact = True
+
+    def count_key(self):
+        query = str(self.object_list.order_by().values('pk').query)
+        return 'count:' + hashlib.md5(query.encode()).hexdigest()
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        if not queryset.query.where and connection.vendor == 'postgresql':
+            estimate = estimate_count(queryset.model)
+            if estimate >= settings.COUNT_ESTIMATE_THRESHOLD:
+                self.count_is_exact = False
+                return estimate
+        try:
+            key = self.count_key()
+        except EmptyResultSet:
+            return 0
+        count = cache.get(key)
+        if count is not None:
+            self.count_is_exact = False
+            return count
+        count = queryset.count()
+        cache.set(key, count, settings.COUNT_CACHE_TIMEOUT)
+        return count
+
+    def validate_number(self, number):
+        """Проверяет номер страницы без верхней границы по count."""
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы должен быть целым числом.')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1.')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('Страница не содержит результатов.')
+        has_following = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        self.correct_count(bottom + len(rows), has_following)
+        return LookaheadPage(rows, number, self, has_following)
+
+    def correct_count(self, seen, has_following):
+        """Исправляет count, если выборка страницы ему противоречит.
+
+        Без следующей страницы число строк известно точно, иначе
+        оно хотя бы на одну больше уже просмотренных.
+        """
+        if has_following:
+            if self.count > seen:
+                return
+            count = seen + 1
+        elif self.count == seen:
+            self.count_is_exact = True
+            return
+        else:
+            count = seen
+        if isinstance(self.object_list, QuerySet):
+            try:
+                cache.delete(self.count_key())
+            except EmptyResultSet:
+                pass
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+        self.count_is_exact = not has_following
 
 
 class CastomPagination(PageNumberPagination):
     page_size = settings.PAGE_NUMBER
     page_size_query_param = 'limit'
+    django_paginator_class = CachedCountPaginator
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['count_is_exact'] = self.page.paginator.count_is_exact
+        return response
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Пагинация по ключу (-pub_date, -id) без OFFSET и COUNT(*).
+
+    Курсор хранит только значение первого поля сортировки, а равные
+    значения пропускает по смещению. Поэтому первым полем может быть
+    лишь неизменяемое поле из cursor_fields: сортировка по счётчикам
+    в этом режиме запрещена, а поиск без явного ordering идёт по дате.
+    """
+    page_size = settings.PAGE_NUMBER
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+    cursor_fields = ('pub_date',)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering[0].lstrip('-') in self.cursor_fields:
+            return ordering
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            raise ValidationError({api_settings.ORDERING_PARAM: (
+                'При курсорной пагинации доступна только сортировка '
+                'по ' + ', '.join(self.cursor_fields) + '.'
+            )})
+        return self.ordering
+
+
+class SubscriptionCursorPagination(RecipeCursorPagination):
+    ordering = ('username', 'id')
+    cursor_fields = ('username',)
+
+
+class FeedCursorPagination(RecipeCursorPagination):
+    """Лента рецептов авторов из подписок пользователя.
+
+    Если авторов не больше FEED_WINDOW_MAX_AUTHORS, запрос ограничен
+    первыми offset + page_size + 1 рецептами каждого автора после
+    курсора: страница всегда лежит среди них. При большом числе
+    подписок страницу быстрее находит обход общего индекса
+    (-pub_date, -id).
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        author_ids = get_subscribed_ids(request)
+        if len(author_ids) > settings.FEED_WINDOW_MAX_AUTHORS:
+            return super().paginate_queryset(
+                queryset.by_authors(author_ids), request, view)
+        offset, reverse, position = (
+            self.decode_cursor(request) or (0, False, None))
+        queryset = queryset.by_authors(
+            author_ids,
+            per_author=offset + self.get_page_size(request) + 1,
+            position=position,
+            reverse=reverse,
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+
+class KeysetPaginationMixin:
+    """Включает курсорную пагинацию по запросу ?pagination=cursor.
+
+    Ссылки next и previous содержат параметр cursor, поэтому следующие
+    страницы остаются в том же режиме. По умолчанию используется
+    pagination_class.
+    """
+    cursor_pagination_class = None
+
+    def use_cursor_pagination(self):
+        params = self.request.query_params
+        return self.cursor_pagination_class is not None and (
+            'cursor' in params or params.get('pagination') == 'cursor'
+        )
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.use_cursor_pagination():
+                self._paginator = self.cursor_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
@@ -1,6 +1,7 @@
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
+from django.conf import settings
 from django.db import transaction
 
 from config.parametrs import MIN_VALUE
@@ -11,10 +12,20 @@ from recipes.models import (
     Recipe,
     RecipeIngredients,
     Tag,
-    User,
-    Subscription
+    User
+)
+from recipes.images import reset_image_variants
+from .fields import (
+    BulkListSerializer,
+    BulkPrimaryKeyRelatedField,
+    ImageVariantField
+)
+from .shopping_list import update_recipe_in_shopping_lists
+from .utils import (
+    get_subscribed_ids,
+    recipe_ingredient_create,
+    recipe_ingredient_update
 )
-from .utils import recipe_ingredient_create
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -43,17 +54,42 @@ class UserSerializer(serializers.ModelSerializer):
         request = self.context.get("request")
         if request is None or request.user.is_anonymous:
             return False
-        return Subscription.objects.filter(
-            user=request.user, author=obj
-        ).exists()
+        return obj.id in get_subscribed_ids(request)
 
 
 class RecipeFollowSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
+    thumbnail = ImageVariantField()
+    image_webp = ImageVariantField()
 
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "thumbnail", "image_webp",
+                  "cooking_time")
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=MIN_VALUE),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_IDS,
+    )
+
+
+class RecipeLimitSerializer(serializers.Serializer):
+    limit = serializers.IntegerField(
+        min_value=MIN_VALUE,
+        max_value=settings.RECIPE_MATCH_MAX_LIMIT,
+        default=settings.RECIPE_MATCH_LIMIT,
+    )
+
+
+class RecipeMatchQuerySerializer(RecipeLimitSerializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=MIN_VALUE),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_IDS,
+    )
 
 
 class FollowSerializer(UserSerializer):
@@ -66,6 +102,8 @@ class FollowSerializer(UserSerializer):
                   "last_name", "is_subscribed", "recipes_count", "recipes")
 
     def get_recipes(self, obj):
+        if hasattr(obj, "recipes_preview"):
+            return RecipeFollowSerializer(obj.recipes_preview, many=True).data
         request = self.context.get("request")
         limit = request.GET.get("recipes_limit")
         queryset = Recipe.objects.filter(author=obj)
@@ -74,6 +112,8 @@ class FollowSerializer(UserSerializer):
         return RecipeFollowSerializer(queryset, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, "recipes_count"):
+            return obj.recipes_count
         return obj.recipe.count()
 
 
@@ -99,7 +139,7 @@ class IngredientRecipeGetSerializer(serializers.ModelSerializer):
 class IngredientRecipeSerializer(serializers.ModelSerializer):
     recipe = serializers.PrimaryKeyRelatedField(read_only=True)
     amount = serializers.IntegerField(write_only=True, min_value=MIN_VALUE)
-    id = serializers.PrimaryKeyRelatedField(
+    id = BulkPrimaryKeyRelatedField(
         source="ingredient",
         queryset=Ingredient.objects.all()
     )
@@ -107,60 +147,53 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredients
         fields = ("id", "amount", "recipe")
+        list_serializer_class = BulkListSerializer
 
 
 class RecipeGetSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
-    ingredients = serializers.SerializerMethodField()
+    ingredients = IngredientRecipeGetSerializer(
+        source="recipe_ingredients", many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     image = Base64ImageField()
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
+    thumbnail = ImageVariantField()
+    image_webp = ImageVariantField()
+    is_favorited = serializers.BooleanField(read_only=True)
+    is_in_shopping_cart = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Recipe
         fields = ("id", "author", "name", "text", "ingredients", "tags",
                   "cooking_time", "is_favorited", "is_in_shopping_cart",
-                  "image")
+                  "image", "thumbnail", "image_webp")
         read_only_fields = ("id", "author",)
 
-    def get_favorite_status(self, queryset):
-        request = self.context.get("request")
-        if not request or request.user.is_anonymous:
-            return False
-        return queryset.filter(user=request.user).exists()
-
-    def get_is_favorited(self, obj):
-        return self.get_favorite_status(obj.favorite_recipe)
-
-    def get_is_in_shopping_cart(self, obj):
-        return self.get_favorite_status(obj.shopping_list)
-
-    def get_ingredients(self, obj):
-        recipe_ingredients = RecipeIngredients.objects.filter(recipe=obj)
-        return IngredientRecipeGetSerializer(recipe_ingredients,
-                                             many=True).data
-
 
 class RecipeSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     ingredients = IngredientRecipeSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True,
     )
     image = Base64ImageField()
+    thumbnail = ImageVariantField()
+    image_webp = ImageVariantField()
     cooking_time = serializers.IntegerField(min_value=MIN_VALUE)
 
     class Meta:
         model = Recipe
         fields = ("id", "author", "name", "text", "ingredients", "tags",
-                  "cooking_time", "image")
+                  "cooking_time", "image", "thumbnail", "image_webp")
         read_only_fields = ("id", "author", "tags")
 
     def validate(self, data):
-        ingredients = self.initial_data.get("ingredients")
-        ingredients_list = [ingredient['id'] for ingredient in ingredients]
+        ingredients = data.get("ingredients")
+        if ingredients is None:
+            return data
+        ingredients_list = [
+            ingredient["ingredient"].pk for ingredient in ingredients
+        ]
         if len(ingredients_list) != len(set(ingredients_list)):
             raise serializers.ValidationError(
                 "Нельзя выбрать ингредиент более одного раза"
@@ -169,8 +202,8 @@ class RecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 "Рецепт не бывает без ингридиентов"
             )
-        for amount in ingredients_list:
-            amount_validator(amount)
+        for ingredient in ingredients:
+            amount_validator(ingredient["amount"])
         return data
 
     def validate_cooking_time(self, time):
@@ -183,7 +216,10 @@ class RecipeSerializer(serializers.ModelSerializer):
         tags_data = validated_data.pop("tags")
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags_data)
-        recipe_ingredient_create(ingredients_data, RecipeIngredients, recipe)
+        self.saved_tags = set(tags_data)
+        self.saved_ingredients = recipe_ingredient_create(
+            ingredients_data, RecipeIngredients, recipe)
+        Recipe.objects.filter(pk=recipe.pk).update_search_vector()
         return recipe
 
     @transaction.atomic()
@@ -191,23 +227,54 @@ class RecipeSerializer(serializers.ModelSerializer):
         if "tags" in self.validated_data:
             tags_data = validated_data.pop("tags")
             instance.tags.set(tags_data)
+            self.saved_tags = set(tags_data)
         if "ingredients" in self.validated_data:
             ingredients_data = validated_data.pop("ingredients")
-            amount_set = RecipeIngredients.objects.filter(
-                recipe__id=instance.id)
-            amount_set.delete()
-            recipe_ingredient_create(ingredients_data, RecipeIngredients,
-                                     instance)
-        return super().update(instance, validated_data)
+            self.saved_ingredients, old_amounts = recipe_ingredient_update(
+                ingredients_data, RecipeIngredients, instance)
+            update_recipe_in_shopping_lists(instance, old_amounts, {
+                ingredient["ingredient"].pk: ingredient["amount"]
+                for ingredient in ingredients_data
+            })
+        if "image" in validated_data:
+            reset_image_variants(instance)
+        recipe = super().update(instance, validated_data)
+        Recipe.objects.filter(pk=recipe.pk).update_search_vector()
+        return recipe
 
     def to_representation(self, instance):
         self.fields.pop("ingredients")
         self.fields.pop("tags")
         representation = super().to_representation(instance)
+        ingredients = getattr(self, "saved_ingredients", None)
+        if ingredients is None:
+            ingredients = RecipeIngredients.objects.filter(
+                recipe=instance).select_related("ingredient")
         representation["ingredients"] = IngredientRecipeGetSerializer(
-            RecipeIngredients.objects.filter(recipe=instance), many=True
+            ingredients, many=True
         ).data
+        tags = getattr(self, "saved_tags", None)
+        if tags is None:
+            tags = instance.tags.all()
         representation["tags"] = TagSerializer(
-            instance.tags, many=True
+            sorted(tags, key=lambda tag: tag.name), many=True
         ).data
         return representation
+
+
+class RecipeMatchSerializer(RecipeFollowSerializer):
+    coverage = serializers.FloatField(read_only=True)
+    matched_count = serializers.IntegerField(read_only=True)
+    missing_ingredients = IngredientRecipeGetSerializer(
+        many=True, read_only=True)
+
+    class Meta(RecipeFollowSerializer.Meta):
+        fields = RecipeFollowSerializer.Meta.fields + (
+            "coverage", "matched_count", "missing_ingredients")
+
+
+class RecipeSimilarSerializer(RecipeFollowSerializer):
+    score = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeFollowSerializer.Meta):
+        fields = RecipeFollowSerializer.Meta.fields + ("score",)
@@ -0,0 +1,220 @@
+import csv
+import hashlib
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.db.models import Sum
+from reportlab.pdfgen import canvas
+from rest_framework.negotiation import DefaultContentNegotiation
+
+from recipes.models import (
+    RecipeIngredients,
+    ShoppingList,
+    ShoppingListItem,
+    User
+)
+
+FORMATS = ("pdf", "txt", "csv", "json")
+
+
+class FormatParamNegotiation(DefaultContentNegotiation):
+    """Параметр format выбирает формат списка покупок,
+    а не рендерер DRF."""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def get_shopping_list(user):
+    """Суммарное количество каждого ингредиента
+    из рецептов в списке покупок пользователя."""
+    return ShoppingListItem.objects.filter(user=user).values(
+        "ingredient__name",
+        "ingredient__measurement_unit",
+        "amount"
+    ).order_by("ingredient__name")
+
+
+def recipe_amounts(recipe_ids):
+    """Количество каждого ингредиента суммарно по рецептам."""
+    return dict(
+        RecipeIngredients.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values("ingredient_id").annotate(
+            total=Sum("amount")
+        ).values_list("ingredient_id", "total").order_by()
+    )
+
+
+def apply_shopping_list_deltas(user_ids, deltas):
+    """Изменяет ShoppingListItem пользователей user_ids на deltas
+    ({ingredient_id: изменение количества})."""
+    deltas = {
+        ingredient_id: delta for ingredient_id, delta in deltas.items()
+        if delta
+    }
+    if not user_ids or not deltas:
+        return
+    list(User.objects.select_for_update().filter(
+        pk__in=user_ids).order_by("pk").values_list("pk", flat=True))
+    items = {
+        (item.user_id, item.ingredient_id): item
+        for item in ShoppingListItem.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas)
+    }
+    to_create, to_update, to_delete = [], [], []
+    for user_id in user_ids:
+        for ingredient_id, delta in deltas.items():
+            item = items.get((user_id, ingredient_id))
+            if item is None:
+                if delta > 0:
+                    to_create.append(ShoppingListItem(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=delta))
+            elif item.amount + delta > 0:
+                item.amount += delta
+                to_update.append(item)
+            else:
+                to_delete.append(item.pk)
+    ShoppingListItem.objects.bulk_create(to_create)
+    ShoppingListItem.objects.bulk_update(to_update, ("amount",))
+    ShoppingListItem.objects.filter(pk__in=to_delete).delete()
+
+
+def add_to_shopping_list(user, recipe_ids):
+    apply_shopping_list_deltas((user.pk,), recipe_amounts(recipe_ids))
+
+
+def remove_from_shopping_list(user, recipe_ids):
+    apply_shopping_list_deltas((user.pk,), {
+        ingredient_id: -amount
+        for ingredient_id, amount in recipe_amounts(recipe_ids).items()
+    })
+
+
+def update_recipe_in_shopping_lists(recipe, old_amounts, new_amounts):
+    """Переносит изменение ингредиентов рецепта в списки покупок
+    всех пользователей, у которых он есть."""
+    deltas = {
+        ingredient_id: (new_amounts.get(ingredient_id, 0)
+                        - old_amounts.get(ingredient_id, 0))
+        for ingredient_id in old_amounts.keys() | new_amounts.keys()
+    }
+    user_ids = list(ShoppingList.objects.filter(
+        recipe=recipe).values_list("user_id", flat=True))
+    apply_shopping_list_deltas(user_ids, deltas)
+
+
+def format_item(number, ingredient):
+    return (f'{number}.  {ingredient["ingredient__name"]} - '
+            f'{ingredient["amount"]} '
+            f'{ingredient["ingredient__measurement_unit"]}')
+
+
+def render_pdf(shopping_list, file):
+    """Записывает PDF со списком покупок в файл."""
+    pdf_file = canvas.Canvas(file)
+    pdf_file.setFont(settings.FONT_NAME, settings.SETFONTS)
+    pdf_file.drawString(
+        settings.TITLE_X,
+        settings.TITLE_Y,
+        "Список покупок:"
+    )
+    pdf_file.setFont(settings.FONT_NAME, settings.SETFONT)
+    from_bottom = settings.BOTTOM_Y
+    for number, ingredient in enumerate(shopping_list, start=1):
+        pdf_file.drawString(
+            settings.ITEM_X,
+            from_bottom,
+            format_item(number, ingredient)
+        )
+        from_bottom -= settings.ITEM_HEIGHT
+        if from_bottom <= settings.MAX_Y:
+            from_bottom = settings.TITLE_Y
+            pdf_file.showPage()
+            pdf_file.setFont(settings.FONT_NAME, settings.SETFONT)
+    pdf_file.showPage()
+    pdf_file.save()
+
+
+def prune_pdf_cache():
+    """Удаляет PDF, которые хранятся дольше PDF_CACHE_TIMEOUT."""
+    expired = time.time() - settings.PDF_CACHE_TIMEOUT
+    with os.scandir(settings.PDF_CACHE_DIR) as entries:
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < expired:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def get_pdf(shopping_list):
+    """Открытый файл PDF со списком покупок.
+
+    Документы хранятся в PDF_CACHE_DIR по ключу от содержимого списка
+    и общие для всех процессов сервера, поэтому повторная загрузка
+    не вызывает ReportLab, а память процесса не занята документами.
+    """
+    shopping_list = list(shopping_list)
+    os.makedirs(settings.PDF_CACHE_DIR, exist_ok=True)
+    path = os.path.join(
+        settings.PDF_CACHE_DIR,
+        hashlib.md5(repr(shopping_list).encode()).hexdigest() + ".pdf"
+    )
+    try:
+        file = open(path, "rb")
+    except FileNotFoundError:
+        pass
+    else:
+        age = time.time() - os.fstat(file.fileno()).st_mtime
+        if age < settings.PDF_CACHE_TIMEOUT:
+            return file
+        file.close()
+    prune_pdf_cache()
+    # Документ пишется во временный файл и подменяет старый целиком:
+    # другой процесс не прочитает недописанный PDF.
+    with tempfile.NamedTemporaryFile(
+        dir=settings.PDF_CACHE_DIR, suffix=".tmp", delete=False
+    ) as file:
+        render_pdf(shopping_list, file)
+    os.replace(file.name, path)
+    return open(path, "rb")
+
+
+def iter_text(shopping_list):
+    yield "Список покупок:\n"
+    for number, ingredient in enumerate(shopping_list, start=1):
+        yield format_item(number, ingredient) + "\n"
+
+
+class Echo:
+    """Буфер для csv.writer, который сразу отдаёт записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(shopping_list):
+    writer = csv.writer(Echo())
+    yield writer.writerow(("name", "measurement_unit", "amount"))
+    for ingredient in shopping_list:
+        yield writer.writerow((
+            ingredient["ingredient__name"],
+            ingredient["ingredient__measurement_unit"],
+            ingredient["amount"],
+        ))
+
+
+def to_json(shopping_list):
+    return [
+        {
+            "name": ingredient["ingredient__name"],
+            "measurement_unit": ingredient["ingredient__measurement_unit"],
+            "amount": ingredient["amount"],
+        }
+        for ingredient in shopping_list
+    ]
@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from api.cache import bump_version
+from api.shopping_list import recipe_amounts, update_recipe_in_shopping_lists
+from api.utils import RECIPE_COUNTERS, change_recipe_counter
+from recipes.models import Ingredient, Recipe, Tag, User
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def reference_data_changed(sender, **kwargs):
+    bump_version(sender)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        Recipe.objects.filter(
+            recipe_ingredients__ingredient=instance
+        ).update_search_vector()
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Убирает ингредиенты рецепта из списков покупок при любом
+    удалении: через API, в админке и каскадом вместе с автором."""
+    update_recipe_in_shopping_lists(
+        instance, recipe_amounts((instance.pk,)), {})
+
+
+@receiver(pre_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    """Избранное и список покупок пользователя удаляются каскадом,
+    счётчики чужих рецептов уменьшаются заранее."""
+    for model in RECIPE_COUNTERS:
+        change_recipe_counter(model, model.objects.filter(
+            user=instance).values("recipe_id"), -1)
@@ -1,43 +1,256 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (
+    Count,
+    F,
+    FloatField,
+    Max,
+    OuterRef,
+    Prefetch,
+    Subquery
+)
+from django.db.models.functions import Cast, Greatest
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.response import Response
 
-from recipes.models import Recipe
+from api.shopping_list import add_to_shopping_list, remove_from_shopping_list
+from recipes.models import (
+    Favorite,
+    Recipe,
+    RecipeIngredients,
+    ShoppingList,
+    ShoppingListItem,
+    Subscription
+)
+
+RECIPE_COUNTERS = {
+    Favorite: "favorites_count",
+    ShoppingList: "in_carts_count",
+}
+
+
+def change_recipe_counter(model, recipe_ids, delta):
+    """Атомарно меняет счётчик избранного или списка покупок."""
+    field = RECIPE_COUNTERS[model]
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
 
 
 def add_favorite_shoppinglist(request, pk, model, serializer):
     recipe = get_object_or_404(Recipe, pk=pk)
-    if model.objects.filter(user=request.user, recipe=recipe).exists():
+    try:
+        with transaction.atomic():
+            model.objects.create(user=request.user, recipe=recipe)
+            change_recipe_counter(model, (recipe.pk,), 1)
+            if model is ShoppingList:
+                add_to_shopping_list(request.user, (recipe.pk,))
+    except IntegrityError:
         return Response(
             {"errors": "Рецепт уже есть в избранном или в списке покупок"},
             status=status.HTTP_400_BAD_REQUEST,
         )
-    model.objects.get_or_create(user=request.user, recipe=recipe)
     data = serializer(recipe).data
     return Response(data, status=status.HTTP_201_CREATED)
 
 
 def remove_favorite_shoppinglist(request, pk, model):
-    recipe = get_object_or_404(Recipe, pk=pk)
-    if model.objects.filter(user=request.user, recipe=recipe).exists():
-        follow = get_object_or_404(model, user=request.user,
-                                   recipe=recipe)
-        follow.delete()
+    with transaction.atomic():
+        deleted, _ = model.objects.filter(
+            user=request.user, recipe_id=pk).delete()
+        if deleted:
+            change_recipe_counter(model, (pk,), -deleted)
+            if model is ShoppingList:
+                remove_from_shopping_list(request.user, (pk,))
+    if deleted:
         return Response(
             status=status.HTTP_204_NO_CONTENT
         )
+    get_object_or_404(Recipe, pk=pk)
     return Response(
         {"errors": "Рецепта нет в избраном или в списке покупок"},
         status=status.HTTP_400_BAD_REQUEST
     )
 
 
+def insert_user_recipes(model, user, recipe_ids):
+    """Добавляет в избранное или список покупок рецепты, которых там
+    ещё нет, и возвращает id действительно добавленных.
+
+    ON CONFLICT DO NOTHING RETURNING точно сообщает, какие строки
+    вставлены этим запросом: строку, которую одновременно добавил
+    другой запрос, он не вернёт, и её счётчик и ингредиенты
+    не будут учтены дважды.
+    """
+    if not recipe_ids:
+        return set()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {model._meta.db_table} (user_id, recipe_id) "
+            f"SELECT %s, unnest(%s::bigint[]) "
+            f"ON CONFLICT DO NOTHING RETURNING recipe_id",
+            [user.pk, sorted(recipe_ids)],
+        )
+        return {recipe_id for recipe_id, in cursor.fetchall()}
+
+
+def bulk_add_favorite_shoppinglist(request, model, ids):
+    recipe_ids = set(
+        Recipe.objects.filter(pk__in=ids).values_list("pk", flat=True))
+    with transaction.atomic():
+        added = insert_user_recipes(model, request.user, recipe_ids)
+        change_recipe_counter(model, added, 1)
+        if model is ShoppingList:
+            add_to_shopping_list(request.user, added)
+    results = [
+        {"id": pk, "status": ("not_found" if pk not in recipe_ids
+                              else "added" if pk in added
+                              else "exists")}
+        for pk in ids
+    ]
+    return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+def bulk_remove_favorite_shoppinglist(request, model, ids=None):
+    """Удаляет рецепты ids из избранного или списка покупок,
+    без ids очищает список целиком."""
+    queryset = model.objects.filter(user=request.user)
+    if ids is not None:
+        queryset = queryset.filter(recipe_id__in=ids)
+    with transaction.atomic():
+        removed = set(queryset.select_for_update().values_list(
+            "recipe_id", flat=True))
+        queryset.filter(recipe_id__in=removed).delete()
+        change_recipe_counter(model, removed, -1)
+        if model is ShoppingList and ids is None:
+            ShoppingListItem.objects.filter(user=request.user).delete()
+        elif model is ShoppingList:
+            remove_from_shopping_list(request.user, removed)
+    if ids is None:
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    recipe_ids = set(
+        Recipe.objects.filter(pk__in=ids).values_list("pk", flat=True))
+    results = [
+        {"id": pk, "status": ("removed" if pk in removed
+                              else "not_found" if pk not in recipe_ids
+                              else "missing")}
+        for pk in ids
+    ]
+    return Response({"results": results}, status=status.HTTP_200_OK)
+
+
 def recipe_ingredient_create(ingredients_data, models, recipe):
     bulk_create_data = (
         models(
             recipe=recipe,
             ingredient=ingredient_data["ingredient"],
-            amount=ingredient_data["amount"])
+            amount=ingredient_data["amount"],
+            recipe_ingredients_count=len(ingredients_data))
         for ingredient_data in ingredients_data
     )
-    models.objects.bulk_create(bulk_create_data)
+    return models.objects.bulk_create(bulk_create_data)
+
+
+def recipe_ingredient_update(ingredients_data, models, recipe):
+    """Обновляет ингредиенты рецепта по разнице с текущими строками:
+    создаёт новые, меняет изменившиеся количества, удаляет лишние.
+    Возвращает актуальные строки и прежние количества."""
+    existing = {
+        row.ingredient_id: row for row in recipe.recipe_ingredients.all()
+    }
+    old_amounts = {
+        ingredient_id: row.amount for ingredient_id, row in existing.items()
+    }
+    count = len(ingredients_data)
+    rows, to_create, to_update = [], [], []
+    for ingredient_data in ingredients_data:
+        ingredient = ingredient_data["ingredient"]
+        row = existing.pop(ingredient.pk, None)
+        if row is None:
+            row = models(recipe=recipe, ingredient=ingredient,
+                         amount=ingredient_data["amount"],
+                         recipe_ingredients_count=count)
+            to_create.append(row)
+        elif (row.amount != ingredient_data["amount"]
+              or row.recipe_ingredients_count != count):
+            row.amount = ingredient_data["amount"]
+            row.recipe_ingredients_count = count
+            to_update.append(row)
+        row.ingredient = ingredient
+        rows.append(row)
+    if to_create:
+        models.objects.bulk_create(to_create)
+    if to_update:
+        models.objects.bulk_update(
+            to_update, ("amount", "recipe_ingredients_count"))
+    if existing:
+        models.objects.filter(
+            pk__in=[row.pk for row in existing.values()]).delete()
+    return rows, old_amounts
+
+
+def get_subscribed_ids(request):
+    """Id авторов, на которых подписан пользователь,
+    загружаются один раз за запрос."""
+    if not hasattr(request, "subscribed_ids"):
+        request.subscribed_ids = set(
+            Subscription.objects.filter(
+                user=request.user
+            ).values_list("author_id", flat=True)
+        )
+    return request.subscribed_ids
+
+
+def annotate_recipes_preview(queryset, limit=None):
+    """Добавляет авторам число рецептов и последние рецепты
+    для всей страницы подписок одним prefetch-запросом."""
+    recipes = Recipe.objects.all()
+    if limit:
+        recipes = recipes.filter(pk__in=Subquery(
+            Recipe.objects.filter(
+                author=OuterRef("author")
+            ).values("pk")[:int(limit)]
+        ))
+    return queryset.annotate(
+        recipes_count=Count("recipe", distinct=True)
+    ).prefetch_related(
+        Prefetch("recipe", queryset=recipes, to_attr="recipes_preview")
+    )
+
+
+def match_recipes(ingredient_ids, limit):
+    """Рецепты, лучше всего покрытые данными ингредиентами.
+
+    RecipeIngredients служит инвертированным индексом: каждая строка
+    хранит число ингредиентов своего рецепта, поэтому ранжирование
+    читает только индекс (ingredient, recipe, recipe_ingredients_count)
+    без обращения к таблице рецептов. У каждого рецепта заполняются
+    coverage, matched_count и missing_ingredients.
+    """
+    matched = Count("recipe")
+    total = Greatest(Max("recipe_ingredients_count"), matched)
+    ranked = list(RecipeIngredients.objects.filter(
+        ingredient_id__in=ingredient_ids
+    ).values("recipe_id").annotate(
+        matched=matched,
+        missing=total - matched,
+        coverage=Cast(matched, FloatField()) / total,
+    ).order_by("-coverage", "missing", "-recipe_id")[:limit])
+    recipes = Recipe.objects.prefetch_related(Prefetch(
+        "recipe_ingredients",
+        queryset=RecipeIngredients.objects.select_related("ingredient"),
+    )).in_bulk([row["recipe_id"] for row in ranked])
+    result = []
+    for row in ranked:
+        recipe = recipes.get(row["recipe_id"])
+        if recipe is None:
+            continue
+        recipe.coverage = row["coverage"]
+        recipe.matched_count = row["matched"]
+        recipe.missing_ingredients = [
+            recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredients.all()
+            if recipe_ingredient.ingredient_id not in ingredient_ids
+        ]
+        result.append(recipe)
+    return result
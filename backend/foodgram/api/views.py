@@ -1,13 +1,8 @@
-import io
-
-from django.db.models import Sum
-from django.conf import settings
-from django.http import FileResponse
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
 from rest_framework.serializers import ValidationError
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.views import APIView
@@ -24,7 +19,12 @@ from api.serializers import (
     IngredientSerializer,
     FollowSerializer,
     RecipeGetSerializer,
-    RecipeFollowSerializer
+    RecipeFollowSerializer,
+    RecipeIdsSerializer,
+    RecipeLimitSerializer,
+    RecipeMatchQuerySerializer,
+    RecipeMatchSerializer,
+    RecipeSimilarSerializer
 )
 from api.permissions import IsAuthorOrReadOnly
 from recipes.models import (
@@ -34,81 +34,189 @@ from recipes.models import (
     Ingredient,
     Favorite,
     ShoppingList,
-    Subscription,
-    RecipeIngredients
+    SimilarRecipe,
+    Subscription
+)
+from api.utils import (
+    add_favorite_shoppinglist,
+    bulk_add_favorite_shoppinglist,
+    bulk_remove_favorite_shoppinglist,
+    annotate_recipes_preview,
+    get_subscribed_ids,
+    match_recipes,
+    remove_favorite_shoppinglist
+)
+from api.cache import (
+    CachedResponseMixin,
+    get_version,
+    get_version_time,
+    make_etag,
+    not_modified
+)
+from api.filters import (
+    IngredientFilter,
+    RecipeFilter,
+    RecipeOrderingFilter
+)
+from api.ingredient_index import ingredient_index
+from api.paginations import (
+    CastomPagination,
+    FeedCursorPagination,
+    KeysetPaginationMixin,
+    RecipeCursorPagination,
+    SubscriptionCursorPagination
+)
+from api.shopping_list import (
+    FORMATS,
+    FormatParamNegotiation,
+    get_pdf,
+    get_shopping_list,
+    iter_csv,
+    iter_text,
+    to_json
 )
-from api.utils import add_favorite_shoppinglist, remove_favorite_shoppinglist
-from api.filters import RecipeFilter, IngredientFilter
-from api.paginations import CastomPagination
 
 
 class ShoppingListDownloadView(APIView):
     permission_classes = (IsAuthenticated,)
+    content_negotiation_class = FormatParamNegotiation
 
     def get(self, request):
-        shopping_list = RecipeIngredients.objects.filter(
-            recipe__shopping_list__user=request.user).values(
-            "ingredient__name",
-            "ingredient__measurement_unit"
-        ).annotate(
-            amount=Sum("amount")
-        ).order_by()
-        font = "Tantular"
-        pdfmetrics.registerFont(
-            TTFont("Tantular",
-                   "./data/Tantular.ttf",
-                   "UTF-8")
-        )
-        buffer = io.BytesIO()
-        pdf_file = canvas.Canvas(buffer)
-        pdf_file.setFont(font, settings.SETFONTS)
-        pdf_file.drawString(
-            settings.TITLE_X,
-            settings.TITLE_Y,
-            "Список покупок:"
-        )
-        pdf_file.setFont(font, settings.SETFONT)
-        from_bottom = settings.BOTTOM_Y
-        for number, ingredient in enumerate(shopping_list, start=1):
-            pdf_file.drawString(
-                settings.ITEM_X,
-                from_bottom,
-                (f'{number}.  {ingredient["ingredient__name"]} - '
-                 f'{ingredient["amount"]} '
-                 f'{ingredient["ingredient__measurement_unit"]}')
+        file_format = request.query_params.get("format", "pdf")
+        if file_format not in FORMATS:
+            raise ValidationError(
+                {"format": f"Допустимые форматы: {', '.join(FORMATS)}."}
+            )
+        shopping_list = get_shopping_list(request.user)
+        if file_format == "json":
+            return Response(to_json(shopping_list))
+        if file_format == "pdf":
+            return FileResponse(
+                get_pdf(shopping_list),
+                as_attachment=True,
+                filename="shopping_list.pdf",
+                content_type="application/pdf"
             )
-            from_bottom -= settings.ITEM_HEIGHT
-            if from_bottom <= settings.MAX_Y:
-                from_bottom = settings.TITLE_Y
-                pdf_file.showPage()
-                pdf_file.setFont(font, settings.SETFONT)
-        pdf_file.showPage()
-        pdf_file.save()
-        buffer.seek(0)
-        return FileResponse(
-            buffer, as_attachment=True, filename="shopping_list.pdf"
+        if file_format == "csv":
+            response = StreamingHttpResponse(
+                iter_csv(shopping_list.iterator()),
+                content_type="text/csv; charset=utf-8"
+            )
+        else:
+            response = StreamingHttpResponse(
+                iter_text(shopping_list.iterator()),
+                content_type="text/plain; charset=utf-8"
+            )
+        response["Content-Disposition"] = (
+            f'attachment; filename="shopping_list.{file_format}"'
         )
+        return response
 
 
-class TagViewSet(ModelViewSet):
+class TagViewSet(CachedResponseMixin, ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
 
-class IngredientViwsSet(ModelViewSet):
+class IngredientViwsSet(CachedResponseMixin, ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
     ordering_fields = ("name",)
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name")
+        if not name:
+            return super().list(request, *args, **kwargs)
+        limit = request.query_params.get("limit")
+        if limit is not None and not limit.isdigit():
+            raise ValidationError(
+                {"limit": "Значение должно быть целым числом."})
+        return Response(ingredient_index.search(
+            name, int(limit) if limit else None))
 
-class RecipeViewSet(ModelViewSet):
-    queryset = Recipe.objects.all()
+
+class RecipeViewSet(KeysetPaginationMixin, ModelViewSet):
     permission_classes = (IsAuthorOrReadOnly,)
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ("pub_date", "favorites_count", "in_carts_count")
+    ordering = ("-pub_date", "-id")
     pagination_class = CastomPagination
+    cursor_pagination_class = RecipeCursorPagination
+
+    def get_queryset(self):
+        return Recipe.objects.annotate_user_flags(
+            self.request.user).with_related()
+
+    def get_etag_queryset(self):
+        """Лёгкий запрос только по полям, от которых зависит ответ."""
+        return Recipe.objects.annotate_user_flags(
+            self.request.user
+        ).select_related("author").only(
+            "id", "pub_date", "updated_at", "author__email",
+            "author__username", "author__first_name", "author__last_name",
+            "author__updated_at"
+        )
+
+    def get_etag(self, recipes, *parts):
+        request = self.request
+        subscribed = (set() if request.user.is_anonymous
+                      else get_subscribed_ids(request))
+        return make_etag(
+            request.get_full_path(),
+            get_version(Tag),
+            get_version(Ingredient),
+            *parts,
+            *((recipe.id, recipe.updated_at, recipe.is_favorited,
+               recipe.is_in_shopping_cart, recipe.author.email,
+               recipe.author.username, recipe.author.first_name,
+               recipe.author.last_name, recipe.author_id in subscribed)
+              for recipe in recipes)
+        )
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_etag_queryset()))
+        etag = self.get_etag(page, self.get_paginated_response([]).data)
+        response = not_modified(request, etag)
+        if response is None:
+            recipes = self.get_queryset().in_bulk(
+                [recipe.id for recipe in page])
+            serializer = self.get_serializer(
+                [recipes[recipe.id] for recipe in page
+                 if recipe.id in recipes],
+                many=True
+            )
+            response = self.get_paginated_response(serializer.data)
+            response["ETag"] = etag
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe = get_object_or_404(
+            self.get_etag_queryset(), pk=self.kwargs["pk"])
+        etag = self.get_etag((recipe,))
+        last_modified = None
+        if request.user.is_anonymous:
+            # Last-Modified учитывает всё, от чего зависит ETag: иначе
+            # запрос только с If-Modified-Since получил бы 304 после
+            # изменения тегов, ингредиентов или профиля автора.
+            last_modified = int(max(
+                recipe.updated_at.timestamp(),
+                recipe.author.updated_at.timestamp(),
+                get_version_time(Tag),
+                get_version_time(Ingredient),
+            ))
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        patch_vary_headers(response, ("Authorization",))
+        return response
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -119,7 +227,7 @@ class RecipeViewSet(ModelViewSet):
         return RecipeSerializer
 
     def get_permissions(self):
-        if self.action != "create":
+        if self.action not in ("create", "feed"):
             return (IsAuthorOrReadOnly(),)
         return super().get_permissions()
 
@@ -137,11 +245,77 @@ class RecipeViewSet(ModelViewSet):
                                              RecipeFollowSerializer)
         return remove_favorite_shoppinglist(request, pk, ShoppingList)
 
+    def bulk_favorite_shoppinglist(self, request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data["ids"]))
+        if request.method == "POST":
+            return bulk_add_favorite_shoppinglist(request, model, ids)
+        return bulk_remove_favorite_shoppinglist(request, model, ids)
+
+    @action(detail=False, methods=["POST", "DELETE"], url_path="favorite")
+    def favorite_bulk(self, request):
+        return self.bulk_favorite_shoppinglist(request, Favorite)
+
+    @action(detail=False, methods=["POST", "DELETE"],
+            url_path="shopping_cart")
+    def shopping_cart_bulk(self, request):
+        return self.bulk_favorite_shoppinglist(request, ShoppingList)
+
+    @action(detail=False, methods=["DELETE"], url_path="shopping_cart/clear")
+    def shopping_cart_clear(self, request):
+        return bulk_remove_favorite_shoppinglist(request, ShoppingList)
 
-class CustomUserViewSet(UserViewSet):
+    @action(
+        detail=False,
+        methods=["GET"],
+        permission_classes=(IsAuthenticated,),
+        filter_backends=(),
+        pagination_class=FeedCursorPagination,
+        cursor_pagination_class=None,
+    )
+    def feed(self, request):
+        """Новые рецепты авторов из подписок, курсорная пагинация
+        по (-pub_date, -id)."""
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    @action(detail=True, methods=["GET"])
+    def similar(self, request, pk):
+        get_object_or_404(Recipe, pk=pk)
+        serializer = RecipeLimitSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        recipes = []
+        for row in SimilarRecipe.objects.filter(
+            recipe_id=pk
+        ).select_related("similar")[:serializer.validated_data["limit"]]:
+            row.similar.score = row.score
+            recipes.append(row.similar)
+        return Response(RecipeSimilarSerializer(
+            recipes, many=True, context=self.get_serializer_context()
+        ).data)
+
+    @action(detail=False, methods=["GET"], url_path="cook")
+    def cook_from_ingredients(self, request):
+        serializer = RecipeMatchQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        recipes = match_recipes(
+            set(serializer.validated_data["ingredients"]),
+            serializer.validated_data["limit"],
+        )
+        return Response(RecipeMatchSerializer(
+            recipes, many=True, context=self.get_serializer_context()
+        ).data)
+
+
+class CustomUserViewSet(KeysetPaginationMixin, UserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = CastomPagination
+    cursor_pagination_class = SubscriptionCursorPagination
 
     @action(
         detail=True, permission_classes=[IsAuthenticated],
@@ -176,7 +350,10 @@ class CustomUserViewSet(UserViewSet):
             methods=["GET"])
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(following__user=user)
+        queryset = annotate_recipes_preview(
+            User.objects.filter(following__user=user).order_by("username"),
+            request.query_params.get("recipes_limit"),
+        )
         pages = self.paginate_queryset(queryset)
         serializer = FollowSerializer(
             pages, many=True,
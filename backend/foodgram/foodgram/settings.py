@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -20,6 +21,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_filters',
     'rest_framework',
     'rest_framework.authtoken',
@@ -70,6 +72,15 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 # DATABASES = {
 #     'default': {
 #         'ENGINE': 'django.db.backends.sqlite3',
@@ -139,3 +150,26 @@ MAX_Y = 50
 SETFONT = 14
 SETFONTS = 24
 PAGE_NUMBER = 6
+FONT_NAME = 'Tantular'
+FONT_PATH = os.path.join(BASE_DIR, 'data', 'Tantular.ttf')
+PDF_CACHE_TIMEOUT = 60 * 60
+PDF_CACHE_DIR = os.getenv(
+    'PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'foodgram_pdf')
+)
+REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+COUNT_CACHE_TIMEOUT = 30
+COUNT_ESTIMATE_THRESHOLD = 100000
+BULK_MAX_IDS = 100
+RECIPE_THUMBNAIL_SIZE = (320, 320)
+RECIPE_IMAGE_MAX_SIZE = (1280, 1280)
+RECIPE_WEBP_QUALITY = 80
+IMAGE_WORKER_INTERVAL = 5
+RECIPE_MATCH_LIMIT = 10
+RECIPE_MATCH_MAX_LIMIT = 50
+SIMILAR_RECIPES_COUNT = 10
+SIMILAR_RECIPES_MAX_POSTINGS = 5000
+SIMILAR_RECIPES_INTERVAL = 60
+FEED_WINDOW_MAX_AUTHORS = 50
+VERSION_CACHE_TIMEOUT = (
+    60 if CACHES['default']['BACKEND'].endswith('LocMemCache') else None
+)
@@ -1,18 +1,56 @@
+from collections import Counter, defaultdict
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+
+from api.shopping_list import (
+    add_to_shopping_list,
+    apply_shopping_list_deltas,
+    recipe_amounts,
+    update_recipe_in_shopping_lists
+)
+from api.utils import change_recipe_counter
+from recipes.images import reset_image_variants
 from recipes.models import (
     Favorite,
     Ingredient,
     Recipe,
     RecipeIngredients,
     ShoppingList,
+    ShoppingListItem,
+    SimilarRecipe,
     Tag,
     User,
     Subscription
 )
 
 
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """Только просмотр.
+
+    has_delete_permission не запрещается: иначе админка не дала бы
+    удалить рецепт или пользователя, с которыми строки удаляются
+    каскадом. Закрыты только прямое удаление и действия.
+    """
+    actions = None
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def change_view(self, request, object_id, form_url="",
+                    extra_context=None):
+        return super().change_view(request, object_id, form_url, {
+            **(extra_context or {}), "show_delete": False})
+
+    def delete_view(self, request, object_id, extra_context=None):
+        raise PermissionDenied
+
+
 class TagInline(admin.TabularInline):
     model = Recipe.tags.through
 
@@ -24,7 +62,8 @@ class IngredientInline(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "author", "count_favorites",)
+    list_display = ("id", "name", "author", "favorites_count",
+                    "in_carts_count",)
     search_fields = (
         "author__username",
         "author__email",
@@ -33,15 +72,31 @@ class RecipeAdmin(admin.ModelAdmin):
         "tags__name",
         "name",
     )
-    list_filter = ("author", "name", "tags",)
+    list_filter = ("author", "name", "tags", "image_processed",)
     ordering = ("name",)
+    readonly_fields = ("favorites_count", "in_carts_count", "thumbnail",
+                       "image_webp", "image_processed",)
+    actions = ("reprocess_images",)
     empty_value_display = "-пусто-"
     inlines = [TagInline, IngredientInline]
 
-    def count_favorites(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+    @admin.action(description="Обработать изображения заново")
+    def reprocess_images(self, request, queryset):
+        queryset.update(image_processed=False)
+
+    def save_model(self, request, obj, form, change):
+        if "image" in form.changed_data:
+            reset_image_variants(obj)
+        super().save_model(request, obj, form, change)
 
-    count_favorites.short_description = "Количество избранных"
+    def save_related(self, request, form, formsets, change):
+        old_amounts = recipe_amounts((form.instance.pk,))
+        super().save_related(request, form, formsets, change)
+        update_recipe_in_shopping_lists(
+            form.instance, old_amounts, recipe_amounts((form.instance.pk,)))
+        recipes = Recipe.objects.filter(pk=form.instance.pk)
+        recipes.update_ingredients_count()
+        recipes.update_search_vector()
 
 
 class UserAdmin(UserAdmin):
@@ -59,16 +114,71 @@ class IngredientAdmin(admin.ModelAdmin):
     search_fields = ("name", "measurement_unit",)
 
 
-@admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class UserRecipeAdmin(admin.ModelAdmin):
+    """Избранное и список покупок: добавление и удаление строк
+    обновляют счётчики рецептов и суммарный список покупок, как в API.
+    Существующие строки не редактируются."""
     list_display = ("user", "recipe",)
     search_fields = ("user__username", "recipe__name",)
 
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @transaction.atomic()
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        change_recipe_counter(self.model, (obj.recipe_id,), 1)
+        if self.model is ShoppingList:
+            add_to_shopping_list(obj.user, (obj.recipe_id,))
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, self.model.objects.filter(pk=obj.pk))
+
+    @transaction.atomic()
+    def delete_queryset(self, request, queryset):
+        rows = list(queryset.select_for_update().values_list(
+            "user_id", "recipe_id"))
+        queryset.delete()
+        removed = Counter(recipe_id for _, recipe_id in rows)
+        for number in set(removed.values()):
+            change_recipe_counter(self.model, [
+                recipe_id for recipe_id, count in removed.items()
+                if count == number
+            ], -number)
+        if self.model is not ShoppingList:
+            return
+        recipes_by_user = defaultdict(list)
+        for user_id, recipe_id in rows:
+            recipes_by_user[user_id].append(recipe_id)
+        for user_id, recipe_ids in recipes_by_user.items():
+            apply_shopping_list_deltas((user_id,), {
+                ingredient_id: -amount
+                for ingredient_id, amount
+                in recipe_amounts(recipe_ids).items()
+            })
+
+
+@admin.register(Favorite)
+class FavoriteAdmin(UserRecipeAdmin):
+    pass
+
 
 @admin.register(ShoppingList)
-class ShoppingListAdmin(admin.ModelAdmin):
-    list_display = ("user", "recipe",)
-    search_fields = ("user__username", "recipe__name",)
+class ShoppingListAdmin(UserRecipeAdmin):
+    pass
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(ReadOnlyAdmin):
+    """Строки считаются из списков покупок."""
+    list_display = ("user", "ingredient", "amount",)
+    search_fields = ("user__username", "ingredient__name",)
+
+
+@admin.register(SimilarRecipe)
+class SimilarRecipeAdmin(admin.ModelAdmin):
+    list_display = ("recipe", "similar", "score",)
+    search_fields = ("recipe__name", "similar__name",)
 
 
 @admin.register(Subscription)
@@ -78,7 +188,9 @@ class SubscriptionAdmin(admin.ModelAdmin):
 
 
 @admin.register(RecipeIngredients)
-class RecipeIngredientsAdmin(admin.ModelAdmin):
+class RecipeIngredientsAdmin(ReadOnlyAdmin):
+    """Ингредиенты меняются в рецепте, где изменения переносятся
+    в списки покупок."""
     list_display = ("recipe", "ingredient", "amount",)
 
 
@@ -0,0 +1,70 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+VARIANT_FIELDS = ("thumbnail", "image_webp", "image_processed")
+
+
+def make_webp(image, size):
+    """Уменьшенная копия изображения в формате WebP."""
+    variant = image.copy()
+    variant.thumbnail(size, Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    variant.save(buffer, "WEBP", quality=settings.RECIPE_WEBP_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def delete_variant_files(recipe):
+    """Удаляет файлы миниатюры и WebP-версии рецепта."""
+    for field in ("thumbnail", "image_webp"):
+        file = getattr(recipe, field)
+        if file:
+            file.delete(save=False)
+        setattr(recipe, field, "")
+
+
+def reset_image_variants(recipe):
+    """Сбрасывает варианты после замены изображения рецепта."""
+    delete_variant_files(recipe)
+    recipe.image_processed = False
+
+
+def delete_image_files(recipe):
+    """Удаляет файлы изображения рецепта и его вариантов."""
+    for field in ("image", "thumbnail", "image_webp"):
+        file = getattr(recipe, field)
+        if file:
+            file.delete(save=False)
+
+
+def process_recipe_image(recipe):
+    """Создаёт миниатюру и WebP-версию изображения рецепта.
+
+    Ошибки чтения файла пробрасываются, рецепт при этом остаётся
+    необработанным, а прежние варианты не удаляются.
+    """
+    variants = {}
+    if recipe.image:
+        with recipe.image.open("rb") as file:
+            image = ImageOps.exif_transpose(Image.open(file))
+            image.load()
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert(
+                "RGBA" if "A" in image.getbands()
+                or "transparency" in image.info else "RGB"
+            )
+        name = os.path.splitext(os.path.basename(recipe.image.name))[0]
+        variants = {
+            "thumbnail": make_webp(image, settings.RECIPE_THUMBNAIL_SIZE),
+            "image_webp": make_webp(image, settings.RECIPE_IMAGE_MAX_SIZE),
+        }
+    # Старые файлы удаляются до сохранения новых, иначе хранилище
+    # добавит к одноимённому файлу суффикс, а старый останется.
+    delete_variant_files(recipe)
+    for field, content in variants.items():
+        getattr(recipe, field).save(f"{name}.webp", content, save=False)
+    recipe.image_processed = True
+    recipe.save(update_fields=(*VARIANT_FIELDS, "updated_at"))
@@ -0,0 +1,104 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from recipes.models import Recipe, SimilarRecipe
+from recipes.similarity import SimilarityIndex
+
+
+class Command(BaseCommand):
+    help = "Расчёт похожих рецептов по общим ингредиентам и тегам."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-k", type=int, default=settings.SIMILAR_RECIPES_COUNT)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Пересчитать только изменённые рецепты и их соседей.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Работать постоянно в режиме --incremental.",
+        )
+        parser.add_argument(
+            "--interval", type=float,
+            default=settings.SIMILAR_RECIPES_INTERVAL)
+
+    def changed_recipes(self):
+        return set(Recipe.objects.filter(
+            Q(similar_updated_at__isnull=True)
+            | Q(updated_at__gt=F("similar_updated_at"))
+        ).values_list("pk", flat=True))
+
+    def affected_recipes(self, index, changed, k):
+        """Изменённые рецепты, рецепты, у которых они были в похожих,
+        и рецепты, в похожие к которым они могут попасть."""
+        recipe_ids = set(changed)
+        recipe_ids.update(SimilarRecipe.objects.filter(
+            similar_id__in=changed).values_list("recipe_id", flat=True))
+        for rows in index.neighbours(sorted(changed), k * 5).values():
+            recipe_ids.update(other for _, other in rows)
+        return recipe_ids
+
+    @transaction.atomic()
+    def save_batch(self, batch, neighbours, started):
+        existing = set(Recipe.objects.filter(pk__in={
+            other for rows in neighbours.values() for _, other in rows
+        } | set(batch)).values_list("pk", flat=True))
+        SimilarRecipe.objects.filter(recipe_id__in=batch).delete()
+        SimilarRecipe.objects.bulk_create(
+            SimilarRecipe(recipe_id=recipe_id, similar_id=other, score=score)
+            for recipe_id, rows in neighbours.items()
+            if recipe_id in existing
+            for score, other in rows if other in existing
+        )
+        Recipe.objects.filter(pk__in=batch).update(similar_updated_at=started)
+
+    def build(self, k, incremental, batch_size):
+        started = timezone.now()
+        if incremental:
+            changed = self.changed_recipes()
+            if not changed:
+                return 0
+        index = SimilarityIndex.load()
+        if incremental and len(changed) <= len(index.recipe_ids) // 2:
+            recipe_ids = sorted(self.affected_recipes(index, changed, k))
+        else:
+            recipe_ids = sorted(Recipe.objects.values_list("pk", flat=True))
+        for start in range(0, len(recipe_ids), batch_size):
+            batch = recipe_ids[start:start + batch_size]
+            neighbours = index.neighbours(batch, k)
+            try:
+                self.save_batch(batch, neighbours, started)
+            except IntegrityError:
+                # Рецепт удалён во время расчёта: пакет помечается
+                # изменённым и пересчитается при следующем запуске.
+                Recipe.objects.filter(pk__in=batch).update(
+                    similar_updated_at=None)
+                self.stderr.write(
+                    f"Пакет с рецепта {batch[0]} пропущен: рецепты "
+                    f"изменились во время расчёта."
+                )
+        return len(recipe_ids)
+
+    def handle(self, *args, **options):
+        incremental = options["incremental"] or options["loop"]
+        while True:
+            start = time.perf_counter()
+            updated = self.build(
+                options["k"], incremental, options["batch_size"])
+            if updated or not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Похожие рецепты пересчитаны для {updated} рецептов "
+                    f"за {time.perf_counter() - start:.1f} с."
+                ))
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
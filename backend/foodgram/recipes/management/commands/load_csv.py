@@ -1,27 +1,88 @@
 import csv
+import json
+import os
+import re
+import time
+from itertools import islice
 
-from django.core.management import BaseCommand
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
 
+from api.cache import bump_version
 from recipes.models import Ingredient
 
+JSON_CHUNK_SIZE = 64 * 1024
+JSON_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def iter_json_array(file, chunk_size=JSON_CHUNK_SIZE):
+    """Элементы JSON-массива по одному: файл читается кусками,
+    в памяти только текущий кусок."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        raise CommandError("JSON-файл должен содержать массив.")
+    position = 1
+    while True:
+        position = JSON_SEPARATORS.match(buffer, position).end()
+        if buffer.startswith("]", position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # Элемент обрезан концом куска: дочитываем файл.
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise CommandError("JSON-файл обрывается до конца массива.")
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield item
+
 
 class Command(BaseCommand):
     help = "Загрузка ингредиентов в базу данных."
 
-    def handle(self, *args, **kwargs):
-        csv_file = "data/ingredients.csv"
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default=os.path.join(settings.BASE_DIR, "data", "ingredients.csv"),
+            help="CSV или JSON файл с ингредиентами.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
 
-        with open(csv_file, encoding="utf-8") as file:
-            csv_reader = csv.reader(file, delimiter=",")
-            for name, measurement_unit in csv_reader:
-                _, created = Ingredient.objects.get_or_create(
+    def read_ingredients(self, path):
+        with open(path, encoding="utf-8") as file:
+            if path.endswith(".json"):
+                for row in iter_json_array(file):
+                    yield Ingredient(
+                        name=row["name"],
+                        measurement_unit=row["measurement_unit"]
+                    )
+                return
+            for name, measurement_unit in csv.reader(file, delimiter=","):
+                yield Ingredient(
                     name=name,
                     measurement_unit=measurement_unit
                 )
-                if created:
-                    self.stdout.write(f"Создан ингредиент: {name}")
-                else:
-                    self.stdout.write(f"Ингредиент {name} уже существует")
-            self.stdout.write(
-                self.style.SUCCESS("Ингредиенты успешно загружены.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count_before = Ingredient.objects.count()
+        ingredients = self.read_ingredients(options["path"])
+        rows = 0
+        while batch := list(islice(ingredients, options["batch_size"])):
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+            rows += len(batch)
+        created = Ingredient.objects.count() - count_before
+        if created:
+            bump_version(Ingredient)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Ингредиенты успешно загружены: {created} новых, "
+                f"{rows - created} уже существовали. "
+                f"{rows} строк за {elapsed:.2f} с "
+                f"({rows / elapsed:.0f} строк/с)."
             )
+        )
@@ -0,0 +1,61 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.images import process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ("Фоновая обработка изображений рецептов: миниатюры "
+            "и WebP-версии.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Работать постоянно, проверяя очередь с интервалом.",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=settings.IMAGE_WORKER_INTERVAL)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Заново обработать изображения всех рецептов.",
+        )
+
+    def process_batch(self, batch_size):
+        with transaction.atomic():
+            recipes = list(
+                Recipe.objects.select_for_update(skip_locked=True)
+                .filter(image_processed=False).order_by("id")[:batch_size]
+            )
+            for recipe in recipes:
+                try:
+                    process_recipe_image(recipe)
+                except OSError as error:
+                    Recipe.objects.filter(pk=recipe.pk).update(
+                        image_processed=True)
+                    self.stderr.write(
+                        f"Рецепт {recipe.pk}: не удалось обработать "
+                        f"изображение ({error})."
+                    )
+        return len(recipes)
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            Recipe.objects.update(image_processed=False)
+        while True:
+            processed = 0
+            while count := self.process_batch(options["batch_size"]):
+                processed += count
+            if processed:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Обработано изображений: {processed}."
+                ))
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,66 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import RecipeIngredients, ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = ("Пересборка или проверка суммарных списков покупок "
+            "(ShoppingListItem) по рецептам в корзинах.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только сравнить с рецептами в корзинах, не изменяя.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def expected_items(self):
+        totals = RecipeIngredients.objects.filter(
+            recipe__shopping_list__user__isnull=False
+        ).values(
+            "recipe__shopping_list__user", "ingredient"
+        ).annotate(total=Sum("amount")).order_by()
+        return {
+            (row["recipe__shopping_list__user"], row["ingredient"]):
+                row["total"]
+            for row in totals.iterator()
+        }
+
+    def handle(self, *args, **options):
+        expected = self.expected_items()
+        if options["check"]:
+            actual = {
+                (user_id, ingredient_id): amount
+                for user_id, ingredient_id, amount
+                in ShoppingListItem.objects.values_list(
+                    "user_id", "ingredient_id", "amount").iterator()
+            }
+            mismatched = {
+                key for key in expected.keys() | actual.keys()
+                if expected.get(key) != actual.get(key)
+            }
+            if mismatched:
+                users = {user_id for user_id, _ in mismatched}
+                raise CommandError(
+                    f"Расхождений: {len(mismatched)} "
+                    f"у {len(users)} пользователей."
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f"Списки покупок согласованы ({len(actual)} позиций)."
+            ))
+            return
+        with transaction.atomic():
+            ShoppingListItem.objects.all().delete()
+            ShoppingListItem.objects.bulk_create(
+                (ShoppingListItem(user_id=user_id,
+                                  ingredient_id=ingredient_id,
+                                  amount=amount)
+                 for (user_id, ingredient_id), amount in expected.items()),
+                batch_size=options["batch_size"],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Списки покупок пересобраны ({len(expected)} позиций)."
+        ))
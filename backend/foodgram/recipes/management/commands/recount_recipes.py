@@ -0,0 +1,28 @@
+from django.core.management import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingList
+
+
+def count_subquery(model):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            recipe=OuterRef("pk")
+        ).values("recipe").annotate(total=Count("id")).values("total")
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = ("Пересчёт счётчиков избранного, списков покупок "
+            "и ингредиентов у рецептов.")
+
+    def handle(self, *args, **kwargs):
+        updated = Recipe.objects.update(
+            favorites_count=count_subquery(Favorite),
+            in_carts_count=count_subquery(ShoppingList),
+        )
+        Recipe.objects.update_ingredients_count()
+        self.stdout.write(
+            self.style.SUCCESS(f"Счётчики пересчитаны у {updated} рецептов.")
+        )
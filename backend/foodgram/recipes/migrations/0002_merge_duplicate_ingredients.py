@@ -0,0 +1,56 @@
+# Generated by Django 3.2 on 2026-10-18 04:35
+
+from django.db import migrations, models
+
+
+AMOUNT_MAX = 32767
+
+
+def merge_duplicate_rows(RecipeIngredients):
+    """Сливает строки одного ингредиента в рецепте в одну,
+    суммируя количество."""
+    duplicates = RecipeIngredients.objects.values(
+        'recipe_id', 'ingredient_id'
+    ).annotate(
+        keep_id=models.Min('id'),
+        total=models.Sum('amount'),
+        rows=models.Count('id'),
+    ).filter(rows__gt=1).order_by()
+    for duplicate in duplicates:
+        RecipeIngredients.objects.filter(id=duplicate['keep_id']).update(
+            amount=min(duplicate['total'], AMOUNT_MAX))
+        RecipeIngredients.objects.filter(
+            recipe_id=duplicate['recipe_id'],
+            ingredient_id=duplicate['ingredient_id'],
+        ).exclude(id=duplicate['keep_id']).delete()
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredients = apps.get_model('recipes', 'RecipeIngredients')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1).order_by()
+    for duplicate in duplicates:
+        extra = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit'],
+        ).exclude(id=duplicate['keep_id'])
+        RecipeIngredients.objects.filter(ingredient__in=extra).update(
+            ingredient_id=duplicate['keep_id'])
+        extra.delete()
+    merge_duplicate_rows(RecipeIngredients)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop),
+    ]
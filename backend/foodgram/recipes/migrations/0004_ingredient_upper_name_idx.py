@@ -0,0 +1,31 @@
+# Generated by Django 3.2 on 2026-10-18 04:50
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_ingredient_unique_name_unit'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            # text_pattern_ops позволяет выполнять name__istartswith
+            # (UPPER(name) LIKE UPPER('...%')) по индексу.
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE INDEX ingredient_upper_name_idx '
+                    'ON recipes_ingredient (UPPER(name) text_pattern_ops);',
+                    'DROP INDEX ingredient_upper_name_idx;',
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='ingredient',
+                    index=models.Index(django.db.models.functions.text.Upper('name'), name='ingredient_upper_name_idx'),
+                ),
+            ],
+        ),
+    ]
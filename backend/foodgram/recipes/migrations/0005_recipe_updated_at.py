@@ -0,0 +1,24 @@
+# Generated by Django 3.2 on 2026-10-18 04:38
+
+from django.db import migrations, models
+
+
+def set_updated_at(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(updated_at=models.F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_ingredient_upper_name_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения рецепта'),
+        ),
+        migrations.RunPython(set_updated_at, migrations.RunPython.noop),
+    ]
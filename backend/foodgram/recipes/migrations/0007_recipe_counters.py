@@ -0,0 +1,48 @@
+# Generated by Django 3.2 on 2026-10-18 04:40
+
+from django.db import migrations, models
+import django.db.models.functions
+
+
+def count_subquery(model):
+    return models.functions.Coalesce(models.Subquery(
+        model.objects.filter(
+            recipe=models.OuterRef('pk')
+        ).values('recipe').annotate(
+            total=models.Count('id')
+        ).values('total')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(
+        favorites_count=count_subquery(apps.get_model('recipes', 'Favorite')),
+        in_carts_count=count_subquery(
+            apps.get_model('recipes', 'ShoppingList')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество добавлений в список покупок'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2 on 2026-10-18 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_processed',
+            field=models.BooleanField(default=False, verbose_name='Изображение обработано'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_webp',
+            field=models.ImageField(blank=True, upload_to='recipes/webp/', verbose_name='Изображение в WebP'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='thumbnail',
+            field=models.ImageField(blank=True, upload_to='recipes/thumbnails/', verbose_name='Миниатюра'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(image_processed=False), fields=['id'], name='recipe_image_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_image_variants'),
+    ]
+
+    operations = [
+        # Промежуточная таблица тегов создаётся Django автоматически,
+        # поэтому индекс (tag_id, recipe_id) для фильтра по тегам
+        # добавляется напрямую. Обратный порядок уже покрыт
+        # уникальным ограничением (recipe_id, tag_id).
+        migrations.RunSQL(
+            'CREATE INDEX recipe_tags_tag_recipe_idx '
+            'ON recipes_recipe_tags (tag_id, recipe_id);',
+            'DROP INDEX recipe_tags_tag_recipe_idx;',
+        ),
+    ]
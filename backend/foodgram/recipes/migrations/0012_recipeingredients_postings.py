@@ -0,0 +1,35 @@
+# Generated by Django 3.2 on 2026-10-18 05:24
+
+from django.db import migrations, models
+
+
+def fill_recipe_ingredients_count(apps, schema_editor):
+    RecipeIngredients = apps.get_model('recipes', 'RecipeIngredients')
+    RecipeIngredients.objects.update(recipe_ingredients_count=models.Subquery(
+        RecipeIngredients.objects.filter(
+            recipe=models.OuterRef('recipe')
+        ).values('recipe').annotate(
+            total=models.Count('id')
+        ).values('total')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipeingredients',
+            name='recipe_ingredients_count',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Всего ингредиентов в рецепте'),
+        ),
+        migrations.AddIndex(
+            model_name='recipeingredients',
+            index=models.Index(fields=['ingredient', 'recipe', 'recipe_ingredients_count'], name='recipeingredient_posting_idx'),
+        ),
+        migrations.RunPython(fill_recipe_ingredients_count,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-18 06:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipe_author_pub_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='recipeingredients',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+    ]
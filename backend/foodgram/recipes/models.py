@@ -1,4 +1,9 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractUser
 from colorfield.fields import ColorField
 
@@ -11,6 +16,8 @@ from config.parametrs import (
     MAX_LENGTH,
 )
 
+SEARCH_CONFIG = "russian"
+
 
 class User(AbstractUser):
     """Модель пользователей."""
@@ -50,6 +57,9 @@ class User(AbstractUser):
         default=USER,
         choices=USER_ROLES
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата изменения профиля")
 
     class Meta:
         ordering = ("username",)
@@ -105,15 +115,102 @@ class Ingredient(models.Model):
         ordering = ("name",)
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
-        models.UniqueConstraint(
-            fields=["name", "measurement_unit"],
-            name="unique_measurement_unit_for_name"
-        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=("name", "measurement_unit"),
+                name="unique_measurement_unit_for_name"),)
+        indexes = (
+            models.Index(Upper("name"), name="ingredient_upper_name_idx"),)
 
     def __str__(self):
         return f"{self.name}, {self.measurement_unit}"
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        """Подгружает автора, теги и ингредиенты рецептов."""
+        return self.select_related("author").prefetch_related(
+            "tags",
+            models.Prefetch(
+                "recipe_ingredients",
+                queryset=RecipeIngredients.objects.select_related(
+                    "ingredient"),
+            ),
+        )
+
+    def annotate_user_flags(self, user):
+        """Добавляет флаги is_favorited и is_in_shopping_cart."""
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef("pk"))),
+            is_in_shopping_cart=models.Exists(ShoppingList.objects.filter(
+                user=user, recipe=models.OuterRef("pk"))),
+        )
+
+    def by_authors(self, author_ids, per_author=None, position=None,
+                   reverse=False):
+        """Рецепты авторов из author_ids, например подписок пользователя.
+
+        С per_author от каждого автора берутся только первые per_author
+        рецептов в порядке ленты (-pub_date, -id) после position, а при
+        reverse — перед ним. Их выбирает LATERAL-подзапрос по индексу
+        (author, -pub_date, -id), поэтому страница ленты не требует
+        сортировки всех рецептов этих авторов.
+        """
+        author_ids = sorted(author_ids)
+        if not author_ids:
+            return self.none()
+        if per_author is None:
+            return self.filter(author__in=author_ids)
+        direction, operator = ("ASC", ">") if reverse else ("DESC", "<")
+        condition, params = "", []
+        if position is not None:
+            condition, params = f"AND pub_date {operator} %s", [position]
+        return self.filter(pk__in=RawSQL(
+            f"SELECT latest.id FROM unnest(%s) AS author (id) "
+            f"CROSS JOIN LATERAL (SELECT id FROM {self.model._meta.db_table} "
+            f"WHERE author_id = author.id {condition} "
+            f"ORDER BY pub_date {direction}, id {direction} LIMIT %s) latest",
+            (author_ids, *params, per_author),
+        ))
+
+    def update_ingredients_count(self):
+        """Пересчитывает у строк RecipeIngredients число
+        ингредиентов их рецепта."""
+        return RecipeIngredients.objects.filter(recipe__in=self).update(
+            recipe_ingredients_count=models.Subquery(
+                RecipeIngredients.objects.filter(
+                    recipe=models.OuterRef("recipe")
+                ).values("recipe").annotate(
+                    total=models.Count("id")
+                ).values("total")
+            )
+        )
+
+    def update_search_vector(self):
+        """Пересчитывает поисковый вектор: название, описание
+        и названия ингредиентов."""
+        ingredient_names = RecipeIngredients.objects.filter(
+            recipe=models.OuterRef("pk")
+        ).values("recipe").annotate(
+            names=StringAgg("ingredient__name", " ")
+        ).values("names")
+        return self.update(search_vector=(
+            SearchVector("name", weight="A", config=SEARCH_CONFIG)
+            + SearchVector("text", weight="B", config=SEARCH_CONFIG)
+            + SearchVector(models.Subquery(ingredient_names),
+                           weight="C", config=SEARCH_CONFIG)
+        ))
+
+
 class Recipe(models.Model):
     """Модель рецептов."""
     author = models.ForeignKey(
@@ -130,6 +227,17 @@ class Recipe(models.Model):
         blank=True,
         null=True,
         verbose_name="Изображение")
+    thumbnail = models.ImageField(
+        upload_to="recipes/thumbnails/",
+        blank=True,
+        verbose_name="Миниатюра")
+    image_webp = models.ImageField(
+        upload_to="recipes/webp/",
+        blank=True,
+        verbose_name="Изображение в WebP")
+    image_processed = models.BooleanField(
+        default=False,
+        verbose_name="Изображение обработано")
     text = models.TextField(
         blank=True,
         null=True,
@@ -151,11 +259,43 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name="Дата публикации рецепта")
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата изменения рецепта")
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Количество добавлений в избранное")
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Количество добавлений в список покупок")
+    similar_updated_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Дата расчёта похожих рецептов")
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name="Поисковый вектор")
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ("-pub_date",)
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
+        indexes = (
+            models.Index(fields=("-pub_date", "-id"),
+                         name="recipe_pub_date_id_idx"),
+            models.Index(fields=("author", "-pub_date", "-id"),
+                         name="recipe_author_pub_date_idx"),
+            models.Index(fields=("-favorites_count", "-id"),
+                         name="recipe_favorites_count_idx"),
+            models.Index(fields=("id",),
+                         condition=models.Q(image_processed=False),
+                         name="recipe_image_pending_idx"),
+            GinIndex(fields=("search_vector",),
+                     name="recipe_search_vector_idx"),)
 
     def __str__(self):
         return self.name
@@ -177,10 +317,21 @@ class RecipeIngredients(models.Model):
     amount = models.PositiveSmallIntegerField(
         validators=(amount_validator,),
         verbose_name="Количество ингредиентов")
+    recipe_ingredients_count = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Всего ингредиентов в рецепте")
 
     class Meta:
         verbose_name = "Ингредиент в рецепте"
         verbose_name_plural = "Ингредиенты в рецепте"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("recipe", "ingredient"),
+                name="unique_recipe_ingredient"),)
+        indexes = (
+            models.Index(
+                fields=("ingredient", "recipe", "recipe_ingredients_count"),
+                name="recipeingredient_posting_idx"),)
 
     def __str__(self):
         return (f"{self.ingredient.name} ({self.ingredient.measurement_unit})"
@@ -267,3 +418,62 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f"Рецепт {self.recipe} добавлен в список покупок к {self.user}"
+
+
+class ShoppingListItem(models.Model):
+    """Модель суммарного количества ингредиента
+    в списке покупок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="shopping_list_items",
+        verbose_name="Пользователь")
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name="shopping_list_items",
+        verbose_name="Ингредиент")
+    amount = models.PositiveIntegerField(
+        verbose_name="Количество ингредиента")
+
+    class Meta:
+        verbose_name = "Ингредиент в списке покупок"
+        verbose_name_plural = "Ингредиенты в списках покупок"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "ingredient"),
+                name="unique_shopping_list_item"),)
+
+    def __str__(self):
+        return f"{self.ingredient} - {self.amount} у {self.user}"
+
+
+class SimilarRecipe(models.Model):
+    """Модель похожих рецептов, рассчитанных заранее."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="similar_recipes",
+        verbose_name="Рецепт")
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="similar_to",
+        verbose_name="Похожий рецепт")
+    score = models.FloatField(
+        verbose_name="Сходство")
+
+    class Meta:
+        ordering = ("-score",)
+        verbose_name = "Похожий рецепт"
+        verbose_name_plural = "Похожие рецепты"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("recipe", "similar"),
+                name="unique_similar_recipe"),)
+        indexes = (
+            models.Index(fields=("recipe", "-score"),
+                         name="similar_recipe_score_idx"),)
+
+    def __str__(self):
+        return f"{self.recipe} ~ {self.similar} ({self.score:.2f})"
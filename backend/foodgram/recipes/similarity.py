@@ -0,0 +1,249 @@
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+
+from recipes.models import Recipe, RecipeIngredients
+
+# Константы для подсчёта битов в uint64 (SWAR popcount).
+POPCOUNT_MASKS = tuple(np.uint64(mask) for mask in (
+    0x5555555555555555, 0x3333333333333333, 0x0F0F0F0F0F0F0F0F,
+    0x0101010101010101))
+POPCOUNT_SHIFTS = tuple(np.uint64(shift) for shift in (1, 2, 4, 56))
+
+
+class SimilarityIndex:
+    """Матрица рецепт × признак (ингредиенты и теги) для расчёта
+    коэффициента Жаккара.
+
+    Редкие ингредиенты хранятся разреженной матрицей: общие признаки
+    пар рецептов считаются её произведением на транспонированную,
+    и только для пар хотя бы с одним общим редким ингредиентом.
+    Теги и частые ингредиенты (соль, сахар), которые есть более чем
+    в SIMILAR_RECIPES_MAX_POSTINGS рецептах, дали бы почти плотное
+    произведение, поэтому они упакованы в битовые маски и добавляются
+    к найденным парам через popcount.
+
+    Сходство пары без общих редких ингредиентов зависит только от
+    маски второго рецепта и числа его признаков, поэтому такие пары
+    ищутся среди групп рецептов с одинаковыми маской и размером.
+    Группы, похожие сильнее k-го найденного кандидата, дополняют
+    top-k, и результат совпадает с полным перебором.
+    """
+
+    def __init__(self, recipe_ids, ingredient_pairs, tag_pairs,
+                 max_postings=None):
+        if max_postings is None:
+            max_postings = settings.SIMILAR_RECIPES_MAX_POSTINGS
+        self.recipe_ids = np.asarray(sorted(recipe_ids), dtype=np.int64)
+        rows = {recipe_id: row for row, recipe_id
+                in enumerate(self.recipe_ids.tolist())}
+        ingredient_rows, ingredients = self.to_arrays(ingredient_pairs, rows)
+        tag_rows, tags = self.to_arrays(tag_pairs, rows)
+        size = len(self.recipe_ids)
+
+        ingredient_ids, ingredient_cols, frequency = np.unique(
+            ingredients, return_inverse=True, return_counts=True)
+        frequent = frequency > max_postings
+        rare = ~frequent[ingredient_cols]
+        rare_cols = np.cumsum(~frequent) - 1
+        self.sparse = sparse.csr_matrix(
+            (np.ones(rare.sum(), dtype=np.int32),
+             (ingredient_rows[rare], rare_cols[ingredient_cols[rare]])),
+            shape=(size, int((~frequent).sum())),
+        )
+        self.sparse_t = self.sparse.T.tocsr()
+
+        frequent_cols = np.cumsum(frequent) - 1
+        _, tag_cols = np.unique(tags, return_inverse=True)
+        dense_rows = np.concatenate((ingredient_rows[~rare], tag_rows))
+        dense_cols = np.concatenate((
+            frequent_cols[ingredient_cols[~rare]],
+            int(frequent.sum()) + tag_cols,
+        ))
+        words = max(1, (int(frequent.sum()) + len(np.unique(tags)) + 63)
+                    // 64)
+        self.dense = np.zeros((size, words), dtype=np.uint64)
+        np.bitwise_or.at(
+            self.dense,
+            (dense_rows, dense_cols // 64),
+            np.left_shift(np.uint64(1), (dense_cols % 64).astype(np.uint64)),
+        )
+        self.sizes = (np.asarray(self.sparse.sum(axis=1)).ravel()
+                      + self.popcount(self.dense))
+
+        # Группы упорядочены по размеру: ограничение размера сверху
+        # отсекает хвост списка групп.
+        groups, self.groups = np.unique(
+            np.column_stack((self.sizes, self.dense.view(np.int64))),
+            axis=0, return_inverse=True)
+        self.group_sizes = groups[:, 0]
+        self.group_masks = np.ascontiguousarray(
+            groups[:, 1:]).view(np.uint64)
+        self.group_members = np.argsort(self.groups, kind="stable")
+        self.group_starts = np.r_[0, np.cumsum(
+            np.bincount(self.groups, minlength=len(groups)))]
+        # Группы, в маске которых есть признак: бит -> номера групп.
+        self.bit_groups = [
+            np.flatnonzero(
+                (self.group_masks[:, bit // 64] >> np.uint64(bit % 64))
+                & np.uint64(1))
+            for bit in range(self.dense.shape[1] * 64)
+        ]
+
+    @staticmethod
+    def to_arrays(pairs, rows):
+        pairs = [(rows[recipe_id], feature_id)
+                 for recipe_id, feature_id in pairs if recipe_id in rows]
+        if not pairs:
+            return (np.empty(0, dtype=np.int64),
+                    np.empty(0, dtype=np.int64))
+        return tuple(np.array(column, dtype=np.int64)
+                     for column in zip(*pairs))
+
+    @staticmethod
+    def popcount(masks):
+        """Число единичных битов в каждой строке масок."""
+        ones, twos, fours, bytes_sum = POPCOUNT_MASKS
+        one, two, four, top = POPCOUNT_SHIFTS
+        masks = masks - ((masks >> one) & ones)
+        masks = (masks & twos) + ((masks >> two) & twos)
+        masks = (masks + (masks >> four)) & fours
+        return ((masks * bytes_sum) >> top).sum(axis=-1, dtype=np.int64)
+
+    @classmethod
+    def load(cls, **kwargs):
+        ingredient_pairs = list(RecipeIngredients.objects.values_list(
+            "recipe_id", "ingredient_id").iterator())
+        tag_pairs = list(Recipe.tags.through.objects.values_list(
+            "recipe_id", "tag_id").iterator())
+        return cls(
+            Recipe.objects.values_list("pk", flat=True),
+            ingredient_pairs,
+            tag_pairs,
+            **kwargs
+        )
+
+    def candidates(self, rows):
+        """Пары с общими редкими ингредиентами: позиции в пакете,
+        строки других рецептов и сходство, по убыванию сходства
+        внутри каждой позиции."""
+        common = (self.sparse[rows] @ self.sparse_t).tocoo()
+        positions, cols = common.row, common.col
+        keep = rows[positions] != cols
+        positions, cols = positions[keep], cols[keep]
+        shared = common.data[keep] + self.popcount(
+            self.dense[rows][positions] & self.dense[cols])
+        scores = shared / (self.sizes[rows][positions] + self.sizes[cols]
+                           - shared)
+        # Сходство лежит в (0, 1], поэтому один ключ упорядочивает
+        # пары по рецепту пакета, а внутри него по убыванию сходства.
+        order = np.argsort(positions + (1 - scores), kind="stable")
+        return positions[order], cols[order], scores[order]
+
+    def groups_above(self, row, bits, level):
+        """Группы со сходством с рецептом выше level, по убыванию
+        сходства: номера групп и сходство."""
+        mask, size = self.dense[row], self.sizes[row]
+        # Сходство d / (size + b - d) при b >= d больше level, только
+        # если общих признаков d > level * size. Группа с d такими
+        # признаками содержит хотя бы один из любых len(bits) - d + 1
+        # признаков рецепта, поэтому берутся самые редкие.
+        min_shared = int(level * size - 1e-9) + 1
+        if min_shared > len(bits):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        limit = len(self.group_sizes)
+        if level > 0:
+            # Даже при всех общих частых признаках (d = len(bits))
+            # сходство выше level только у групп размером меньше
+            # len(bits) * (1 + level) / level - size.
+            limit = np.searchsorted(
+                self.group_sizes,
+                len(bits) * (1 + level) / level - size + 1e-9)
+        groups = np.concatenate([
+            self.bit_groups[bit][
+                :np.searchsorted(self.bit_groups[bit], limit)]
+            for bit in bits[:len(bits) - min_shared + 1]
+        ])
+        shared = self.popcount(self.group_masks[groups] & mask)
+        scores = shared / (size + self.group_sizes[groups] - shared)
+        keep = scores > level
+        groups, scores = groups[keep], scores[keep]
+        order = np.lexsort((groups, -scores))
+        groups, scores = groups[order], scores[order]
+        # Группа попадает в список по каждому общему признаку
+        # из выбранных, повторы идут подряд.
+        first = np.diff(groups, prepend=-1) != 0
+        return groups[first], scores[first]
+
+    def group_neighbours(self, row, found, exclude, k):
+        """До k рецептов без общих редких ингредиентов, которые
+        похожи сильнее k-го из найденных кандидатов found, кроме
+        самого рецепта и всех кандидатов exclude."""
+        threshold = found[-1][0] if len(found) == k else 0
+        mask = self.dense[row]
+        bits = sorted(
+            (bit for bit in range(len(self.bit_groups))
+             if mask[bit // 64] >> np.uint64(bit % 64) & np.uint64(1)),
+            key=lambda bit: len(self.bit_groups[bit]),
+        )
+        # Сходство без общих редких ингредиентов не больше доли
+        # частых признаков в рецепте.
+        upper = len(bits) / max(1, self.sizes[row])
+        if upper <= threshold:
+            return []
+        exclude = np.sort(np.append(exclude, row))
+        # Порог снижается от upper к threshold: если выше уровня
+        # набралось k рецептов, остальные в top-k не попадут, а на
+        # высоком уровне просматривается мало групп. Уровень не ниже
+        # k-го сходства среди уже найденных рецептов.
+        result = []
+        for share in (0.3, 0.1, 0):
+            level = threshold + (upper - threshold) * share
+            known = sorted((score for score, _ in found + result),
+                           reverse=True)
+            last = share == 0 or len(known) >= k and known[k - 1] >= level
+            if len(known) >= k:
+                level = max(level, known[k - 1])
+            result = []
+            groups, scores = self.groups_above(row, bits, level)
+            for group, score in zip(groups.tolist(), scores.tolist()):
+                need = k - len(result)
+                if need <= 0:
+                    break
+                # Среди первых need + len(exclude) участников группы
+                # хотя бы need не исключены.
+                members = self.group_members[
+                    self.group_starts[group]:self.group_starts[group + 1]
+                ][:need + len(exclude)]
+                excluded = exclude[np.minimum(
+                    np.searchsorted(exclude, members), len(exclude) - 1)]
+                members = members[excluded != members][:need]
+                result.extend((score, col) for col in members.tolist())
+            if last or len(result) + sum(
+                    score > level for score, _ in found) >= k:
+                break
+        return result
+
+    def neighbours(self, recipe_ids, k):
+        """Top-k похожих для пакета рецептов: {id: [(score, id), ...]}."""
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        result = {recipe_id: [] for recipe_id in recipe_ids.tolist()}
+        rows = np.searchsorted(
+            self.recipe_ids,
+            recipe_ids[np.isin(recipe_ids, self.recipe_ids)])
+        if not len(rows) or k <= 0:
+            return result
+        positions, cols, scores = self.candidates(rows)
+        bounds = np.searchsorted(positions, np.arange(len(rows) + 1))
+        for position, row in enumerate(rows.tolist()):
+            start, end = bounds[position], bounds[position + 1]
+            found = list(zip(scores[start:end][:k].tolist(),
+                             cols[start:end][:k].tolist()))
+            found += self.group_neighbours(
+                row, found, cols[start:end], k)
+            found.sort(key=lambda pair: (-pair[0], pair[1]))
+            result[int(self.recipe_ids[row])] = [
+                (score, int(self.recipe_ids[col]))
+                for score, col in found[:k]
+            ]
+        return result
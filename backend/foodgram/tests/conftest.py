@@ -0,0 +1,87 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Версии и закэшированные ответы не переходят между тестами."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        username="user", email="user@example.com", password="password",
+        first_name="Имя", last_name="Фамилия")
+
+
+@pytest.fixture
+def author(django_user_model):
+    return django_user_model.objects.create_user(
+        username="author", email="author@example.com", password="password",
+        first_name="Имя", last_name="Фамилия")
+
+
+@pytest.fixture
+def admin_user(django_user_model):
+    return django_user_model.objects.create_superuser(
+        username="admin", email="admin@example.com", password="password")
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def tags():
+    return Tag.objects.bulk_create(
+        Tag(name=f"Тег {number}", slug=f"tag{number}", color="#FF0000")
+        for number in range(3)
+    )
+
+
+@pytest.fixture
+def ingredients():
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f"Ингредиент {number}", measurement_unit="г")
+        for number in range(20)
+    )
+
+
+def create_recipes(author, tags, ingredients, count):
+    recipes = Recipe.objects.bulk_create(
+        Recipe(author=author, name=f"Рецепт {number}", text="Описание",
+               cooking_time=10, image="recipes/image.png",
+               image_processed=True)
+        for number in range(count)
+    )
+    for number, recipe in enumerate(recipes):
+        recipe.tags.set(tags[:1 + number % len(tags)])
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(
+                recipe=recipe,
+                ingredient=ingredients[(number + shift) % len(ingredients)],
+                amount=shift + 1,
+                recipe_ingredients_count=4,
+            )
+            for shift in range(4)
+        )
+    return recipes
+
+
+@pytest.fixture
+def recipes(author, tags, ingredients):
+    return create_recipes(author, tags, ingredients, 12)
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from recipes.models import Tag
+
+
+@pytest.fixture
+def memcached_keys(monkeypatch):
+    """Проверка ключей по правилам memcached поверх кэша в памяти."""
+    monkeypatch.setattr(LocMemCache, "validate_key",
+                        BaseMemcachedCache.validate_key)
+
+
+@pytest.mark.django_db
+def test_cached_response_key_fits_memcached(client, memcached_keys):
+    Tag.objects.create(name="Завтрак", slug="breakfast", color="#FF0000")
+    url = "/api/tags/?" + "&".join(
+        f"utm_param{number}=value{number}" for number in range(20))
+    assert len(url) > 250
+    first = client.get(url)
+    assert first.status_code == 200
+    second = client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert second.status_code == 304
+
+
+def next_second():
+    """Last-Modified точен до секунды: изменение должно попасть
+    в следующую."""
+    time.sleep(1 - time.time() % 1)
+
+
+def rename_tag(recipe):
+    tag = recipe.tags.first()
+    tag.name = "Новое название"
+    tag.save()
+
+
+def rename_ingredient(recipe):
+    ingredient = recipe.ingredients.first()
+    ingredient.name = "Новое название"
+    ingredient.save()
+
+
+def rename_author(recipe):
+    recipe.author.first_name = "Новое имя"
+    recipe.author.save()
+
+
+@pytest.mark.django_db
+def test_if_modified_since_without_changes(client, recipes):
+    url = f"/api/recipes/{recipes[0].pk}/"
+    first = client.get(url)
+    assert first.status_code == 200
+    second = client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+    assert second.status_code == 304
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "change", (rename_tag, rename_ingredient, rename_author))
+def test_if_modified_since_covers_etag_inputs(client, recipes, change):
+    """Изменения, которые меняют ETag, сдвигают и Last-Modified."""
+    url = f"/api/recipes/{recipes[0].pk}/"
+    first = client.get(url)
+    next_second()
+    change(recipes[0])
+    second = client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+    assert second.status_code == 200
+    assert second["ETag"] != first["ETag"]
@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+from django.db import connection
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Favorite,
+    Recipe,
+    ShoppingList,
+    ShoppingListItem
+)
+
+THREADS = 8
+ROUNDS = 5
+URLS = {
+    Favorite: "/api/recipes/{}/favorite/",
+    ShoppingList: "/api/recipes/{}/shopping_cart/",
+}
+COUNTERS = {
+    Favorite: "favorites_count",
+    ShoppingList: "in_carts_count",
+}
+
+
+def run_parallel(requests):
+    """Выполняет запросы одновременно, каждый в своём потоке
+    и со своим соединением с базой, и возвращает коды ответов."""
+    barrier = threading.Barrier(len(requests))
+    statuses = [None] * len(requests)
+
+    def worker(number, user, method, url):
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            barrier.wait()
+            statuses[number] = getattr(client, method)(url).status_code
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=worker, args=(number, *request))
+        for number, request in enumerate(requests)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses
+
+
+@pytest.fixture
+def users(django_user_model):
+    return [
+        django_user_model.objects.create_user(
+            username=f"user{number}", email=f"user{number}@example.com",
+            password="password")
+        for number in range(THREADS)
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("model", (Favorite, ShoppingList))
+def test_parallel_add_same_recipe(model, user, recipes):
+    recipe = recipes[0]
+    url = URLS[model].format(recipe.pk)
+    for _ in range(ROUNDS):
+        statuses = run_parallel([(user, "post", url)] * THREADS)
+        assert sorted(statuses) == [201] + [400] * (THREADS - 1)
+        assert model.objects.filter(user=user, recipe=recipe).count() == 1
+        recipe.refresh_from_db()
+        assert getattr(recipe, COUNTERS[model]) == 1
+        statuses = run_parallel([(user, "delete", url)] * THREADS)
+        assert sorted(statuses) == [204] + [400] * (THREADS - 1)
+        assert not model.objects.filter(user=user, recipe=recipe).exists()
+        recipe.refresh_from_db()
+        assert getattr(recipe, COUNTERS[model]) == 0
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("model", (Favorite, ShoppingList))
+def test_parallel_toggles_keep_counters(model, users, recipes):
+    """Одновременные добавления и удаления разными пользователями
+    оставляют счётчик равным числу строк."""
+    url = URLS[model].format(recipes[0].pk)
+    for round_number in range(ROUNDS):
+        run_parallel([
+            (user, "post" if (number + round_number) % 3 else "delete", url)
+            for number, user in enumerate(users)
+        ] * 2)
+        rows = model.objects.filter(recipe=recipes[0])
+        assert rows.count() == rows.values("user").distinct().count()
+        assert getattr(
+            Recipe.objects.get(pk=recipes[0].pk), COUNTERS[model]
+        ) == rows.count()
+        if model is ShoppingList:
+            expected = {
+                (user_id, row.ingredient_id, row.amount)
+                for user_id in rows.values_list("user_id", flat=True)
+                for row in recipes[0].recipe_ingredients.all()
+            }
+            assert set(ShoppingListItem.objects.values_list(
+                "user_id", "ingredient_id", "amount")) == expected
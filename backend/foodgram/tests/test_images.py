@@ -0,0 +1,50 @@
+from io import BytesIO
+
+import pytest
+from django.core.files.base import ContentFile
+from PIL import Image
+
+from recipes.images import process_recipe_image, reset_image_variants
+from recipes.models import Recipe
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+def png(color):
+    buffer = BytesIO()
+    Image.new("RGB", (40, 30), color).save(buffer, "PNG")
+    return ContentFile(buffer.getvalue())
+
+
+def stored_files(root):
+    return sorted(
+        str(path.relative_to(root)) for path in root.rglob("*")
+        if path.is_file())
+
+
+@pytest.mark.django_db
+def test_variants_replace_old_files(media_root, author):
+    recipe = Recipe(author=author, name="Рецепт", text="Описание",
+                    cooking_time=10)
+    recipe.image.save("image.png", png("red"), save=False)
+    recipe.save()
+    process_recipe_image(recipe)
+    processed = stored_files(media_root)
+    assert len(processed) == 3
+
+    process_recipe_image(recipe)
+    assert stored_files(media_root) == processed
+
+    recipe.image.save("other.png", png("blue"), save=False)
+    reset_image_variants(recipe)
+    recipe.save()
+    assert stored_files(media_root) == [
+        "recipes/image.png", "recipes/other.png"]
+    process_recipe_image(recipe)
+    assert stored_files(media_root) == [
+        "recipes/image.png", "recipes/other.png",
+        "recipes/thumbnails/other.webp", "recipes/webp/other.webp"]
@@ -0,0 +1,22 @@
+import pytest
+from django.db import connection
+
+from api.filters import IngredientFilter
+from recipes.models import Ingredient
+
+
+@pytest.mark.django_db
+def test_ingredient_name_filter_uses_upper_name_index():
+    """Поиск по началу названия выполняется по индексу
+    ingredient_upper_name_idx, а не полным просмотром таблицы."""
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f"ингредиент {number:05}", measurement_unit="г")
+        for number in range(5000)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {Ingredient._meta.db_table}")
+    queryset = IngredientFilter(
+        {"name": "ИНГРЕДИЕНТ 0012"}, queryset=Ingredient.objects.all()).qs
+    plan = queryset.explain()
+    assert "ingredient_upper_name_idx" in plan, plan
+    assert queryset.count() == 10
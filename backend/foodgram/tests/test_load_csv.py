@@ -0,0 +1,44 @@
+import io
+import json
+import os
+
+import pytest
+from django.conf import settings
+from django.core.management import CommandError, call_command
+
+from recipes.management.commands.load_csv import iter_json_array
+from recipes.models import Ingredient
+
+JSON_PATH = os.path.join(settings.BASE_DIR, "data", "ingredients.json")
+
+
+@pytest.mark.parametrize("chunk_size", (1, 7, 4096))
+def test_iter_json_array_matches_json_load(chunk_size):
+    with open(JSON_PATH, encoding="utf-8") as file:
+        expected = json.load(file)
+    with open(JSON_PATH, encoding="utf-8") as file:
+        assert list(iter_json_array(file, chunk_size)) == expected
+
+
+@pytest.mark.parametrize(
+    "content", ("[]", " [ ] ", '\n[{"a": 1},\n {"b": [2]}\n]'))
+def test_iter_json_array_edges(content):
+    assert list(iter_json_array(io.StringIO(content), 2)) == (
+        json.loads(content))
+
+
+@pytest.mark.parametrize("content", ('{"a": 1}', '[{"a": 1}, {"b"'))
+def test_iter_json_array_rejects_invalid(content):
+    with pytest.raises(CommandError):
+        list(iter_json_array(io.StringIO(content), 3))
+
+
+@pytest.mark.django_db
+def test_load_json():
+    with open(JSON_PATH, encoding="utf-8") as file:
+        expected = {(row["name"], row["measurement_unit"])
+                    for row in json.load(file)}
+    call_command("load_csv", JSON_PATH, "--batch-size", "500")
+    call_command("load_csv", JSON_PATH)
+    assert set(Ingredient.objects.values_list(
+        "name", "measurement_unit")) == expected
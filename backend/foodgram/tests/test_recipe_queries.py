@@ -0,0 +1,52 @@
+import pytest
+
+from recipes.models import Favorite, ShoppingList, Subscription
+
+LIST_URL = "/api/recipes/"
+DETAIL_URL = "/api/recipes/{}/"
+
+
+@pytest.fixture
+def user_lists(user, author, recipes):
+    """Избранное, список покупок и подписка пользователя,
+    чтобы флаги в ответе были заполнены."""
+    Favorite.objects.bulk_create(
+        Favorite(user=user, recipe=recipe) for recipe in recipes[::2])
+    ShoppingList.objects.bulk_create(
+        ShoppingList(user=user, recipe=recipe) for recipe in recipes[::3])
+    Subscription.objects.create(user=user, author=author)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("authenticated, queries", ((False, 6), (True, 7)))
+def test_recipe_list_queries(authenticated, queries, client, user_client,
+                             user_lists, django_assert_num_queries):
+    """Страница списка загружается постоянным числом запросов:
+    рецепты, теги и ингредиенты одним запросом на страницу,
+    число рецептов и подписки пользователя — по одному."""
+    api_client = user_client if authenticated else client
+    with django_assert_num_queries(queries):
+        response = api_client.get(LIST_URL)
+    assert response.status_code == 200
+    results = response.data["results"]
+    assert len(results) > 1
+    assert all(recipe["tags"] and recipe["ingredients"]
+               for recipe in results)
+    if authenticated:
+        assert any(recipe["is_favorited"] for recipe in results)
+        assert any(recipe["is_in_shopping_cart"] for recipe in results)
+        assert all(recipe["author"]["is_subscribed"] for recipe in results)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("authenticated, queries", ((False, 4), (True, 5)))
+def test_recipe_detail_queries(authenticated, queries, client, user_client,
+                               recipes, user_lists,
+                               django_assert_num_queries):
+    api_client = user_client if authenticated else client
+    with django_assert_num_queries(queries):
+        response = api_client.get(DETAIL_URL.format(recipes[0].pk))
+    assert response.status_code == 200
+    assert response.data["tags"] and response.data["ingredients"]
+    assert response.data["is_favorited"] is authenticated
+    assert response.data["is_in_shopping_cart"] is authenticated
@@ -0,0 +1,59 @@
+import pytest
+
+from api import shopping_list
+
+URL = "/api/recipes/download_shopping_cart/?format=pdf"
+
+
+@pytest.fixture
+def pdf_cache_dir(settings, tmp_path):
+    settings.PDF_CACHE_DIR = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    calls = []
+    render_pdf = shopping_list.render_pdf
+
+    def counting_render_pdf(items, file):
+        calls.append(items)
+        render_pdf(items, file)
+
+    monkeypatch.setattr(shopping_list, "render_pdf", counting_render_pdf)
+    return calls
+
+
+def download(client):
+    response = client.get(URL)
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/pdf"
+    assert "shopping_list.pdf" in response["Content-Disposition"]
+    return b"".join(response.streaming_content)
+
+
+@pytest.mark.django_db
+def test_pdf_is_rendered_once_per_contents(
+        user_client, recipes, pdf_cache_dir, renders):
+    user_client.post(f"/api/recipes/{recipes[0].pk}/shopping_cart/")
+    first = download(user_client)
+    assert first.startswith(b"%PDF")
+    assert download(user_client) == first
+    assert len(renders) == 1
+    assert [path.suffix for path in pdf_cache_dir.iterdir()] == [".pdf"]
+
+    user_client.post(f"/api/recipes/{recipes[1].pk}/shopping_cart/")
+    assert download(user_client) != first
+    assert len(renders) == 2
+
+
+@pytest.mark.django_db
+def test_expired_pdf_is_pruned(
+        user_client, recipes, pdf_cache_dir, renders, settings):
+    user_client.post(f"/api/recipes/{recipes[0].pk}/shopping_cart/")
+    download(user_client)
+    settings.PDF_CACHE_TIMEOUT = -1
+    user_client.post(f"/api/recipes/{recipes[1].pk}/shopping_cart/")
+    download(user_client)
+    assert len(renders) == 2
+    assert len(list(pdf_cache_dir.iterdir())) == 1
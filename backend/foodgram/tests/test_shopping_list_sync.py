@@ -0,0 +1,147 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Favorite,
+    Recipe,
+    ShoppingList,
+    ShoppingListItem,
+    User
+)
+
+RECIPE_ADMIN_URL = "/admin/recipes/recipe/{}/"
+
+
+def assert_in_sync():
+    """Суммарные списки покупок и счётчики совпадают с корзинами."""
+    call_command("rebuild_shopping_lists", "--check", stdout=io.StringIO())
+    for recipe in Recipe.objects.all():
+        assert recipe.favorites_count == recipe.favorite_recipe.count()
+        assert recipe.in_carts_count == recipe.shopping_list.count()
+
+
+@pytest.fixture
+def carts(user_client, user, author, recipes):
+    """Рецепты автора в избранном и списке покупок пользователя,
+    добавленные через API."""
+    for recipe in recipes[:4]:
+        user_client.post(f"/api/recipes/{recipe.pk}/shopping_cart/")
+        user_client.post(f"/api/recipes/{recipe.pk}/favorite/")
+    assert ShoppingListItem.objects.filter(user=user).exists()
+    assert_in_sync()
+
+
+def admin_form_data(response):
+    """Данные формы изменения рецепта в админке, как их отправит
+    браузер без изменений: основная форма и все inline-формы."""
+    data = {}
+    forms = [response.context["adminform"].form]
+    for inline in response.context["inline_admin_formsets"]:
+        formset = inline.formset
+        for field, value in formset.management_form.initial.items():
+            data[f"{formset.prefix}-{field}"] = value
+        # Пустые дополнительные формы браузер отправляет без значений.
+        data[f"{formset.prefix}-TOTAL_FORMS"] = formset.initial_form_count()
+        forms.extend(formset.initial_forms)
+    for form in forms:
+        for name, field in form.fields.items():
+            value = form[name].value()
+            if value is None or name == "image":
+                continue
+            data[form.add_prefix(name)] = (
+                [item.pk if hasattr(item, "pk") else item for item in value]
+                if isinstance(value, (list, tuple)) else value)
+    return data
+
+
+@pytest.mark.django_db
+def test_admin_recipe_delete_updates_shopping_lists(admin_client, carts,
+                                                    recipes):
+    response = admin_client.post(
+        RECIPE_ADMIN_URL.format(recipes[0].pk) + "delete/", {"post": "yes"})
+    assert response.status_code == 302
+    assert not Recipe.objects.filter(pk=recipes[0].pk).exists()
+    assert_in_sync()
+
+
+@pytest.mark.django_db
+def test_author_delete_updates_shopping_lists(carts, author, user):
+    author.delete()
+    assert not ShoppingListItem.objects.filter(user=user).exists()
+    assert_in_sync()
+
+
+@pytest.mark.django_db
+def test_user_delete_updates_counters(carts, user):
+    user.delete()
+    assert_in_sync()
+    assert not Recipe.objects.filter(favorites_count__gt=0).exists()
+
+
+@pytest.mark.django_db
+def test_admin_ingredient_inline_updates_shopping_lists(
+        admin_client, carts, recipes, ingredients):
+    url = RECIPE_ADMIN_URL.format(recipes[0].pk) + "change/"
+    data = admin_form_data(admin_client.get(url))
+    prefix = next(key for key in data if key.endswith("-0-amount"))[
+        :-len("0-amount")]
+    data[prefix + "0-amount"] = 100
+    data[prefix + "1-DELETE"] = "on"
+    total = int(data[prefix + "TOTAL_FORMS"])
+    data[prefix + f"{total}-ingredient"] = ingredients[-1].pk
+    data[prefix + f"{total}-amount"] = 7
+    data[prefix + f"{total}-recipe_ingredients_count"] = 4
+    data[prefix + "TOTAL_FORMS"] = total + 1
+    response = admin_client.post(url, data)
+    assert response.status_code == 302, response.context[
+        "adminform"].form.errors
+    assert recipes[0].recipe_ingredients.get(
+        ingredient=ingredients[-1]).amount == 7
+    assert_in_sync()
+
+
+@pytest.mark.django_db
+def test_admin_cart_rows_update_shopping_lists(admin_client, carts, user,
+                                               recipes):
+    response = admin_client.post("/admin/recipes/shoppinglist/add/", {
+        "user": user.pk, "recipe": recipes[5].pk})
+    assert response.status_code == 302
+    assert_in_sync()
+    rows = ShoppingList.objects.filter(recipe__in=recipes[:3])
+    response = admin_client.post("/admin/recipes/shoppinglist/", {
+        "action": "delete_selected", "post": "yes", "index": 0,
+        "_selected_action": list(rows.values_list("pk", flat=True))})
+    assert response.status_code == 302
+    assert not rows.exists()
+    favorite = Favorite.objects.first()
+    response = admin_client.post(
+        f"/admin/recipes/favorite/{favorite.pk}/delete/", {"post": "yes"})
+    assert response.status_code == 302
+    assert_in_sync()
+
+
+@pytest.mark.django_db
+def test_shopping_list_items_are_read_only_in_admin(admin_client, carts):
+    item = ShoppingListItem.objects.first()
+    url = f"/admin/recipes/shoppinglistitem/{item.pk}/"
+    assert admin_client.get(
+        "/admin/recipes/shoppinglistitem/add/").status_code == 403
+    assert admin_client.post(url + "change/", {
+        "user": item.user_id, "ingredient": item.ingredient_id,
+        "amount": 1}).status_code == 403
+    assert admin_client.post(
+        url + "delete/", {"post": "yes"}).status_code == 403
+    item.refresh_from_db()
+    assert User.objects.filter(pk=item.user_id).exists()
+
+
+@pytest.mark.django_db
+def test_api_recipe_delete_updates_shopping_lists(carts, author, recipes):
+    client = APIClient()
+    client.force_authenticate(author)
+    response = client.delete(f"/api/recipes/{recipes[1].pk}/")
+    assert response.status_code == 204
+    assert_in_sync()
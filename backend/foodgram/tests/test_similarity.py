@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from recipes.models import Recipe, RecipeIngredients
+from recipes.similarity import SimilarityIndex
+
+K = 5
+
+
+def brute_force(recipe_ids, ingredient_pairs, tag_pairs, k):
+    """Top-k по коэффициенту Жаккара полным перебором пар."""
+    features = {recipe_id: set() for recipe_id in recipe_ids}
+    for recipe_id, ingredient_id in ingredient_pairs:
+        features[recipe_id].add(("ingredient", ingredient_id))
+    for recipe_id, tag_id in tag_pairs:
+        features[recipe_id].add(("tag", tag_id))
+    result = {}
+    for recipe_id, own in features.items():
+        scores = [
+            (len(own & other) / len(own | other), other_id)
+            for other_id, other in features.items()
+            if other_id != recipe_id and own & other
+        ]
+        scores.sort(key=lambda pair: (-pair[0], pair[1]))
+        result[recipe_id] = scores[:k]
+    return features, result
+
+
+def catalog(seed, recipes=150, ingredients=60, tags=4):
+    """Каталог, в котором часть ингредиентов встречается часто,
+    как соль и сахар, а у части рецептов нет ингредиентов."""
+    generator = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(ingredients)]
+    recipe_ids = list(range(1, recipes + 1))
+    ingredient_pairs = {
+        (recipe_id, ingredient_id)
+        for recipe_id in recipe_ids
+        for ingredient_id in generator.choices(
+            range(ingredients), weights, k=generator.randint(0, 8))
+    }
+    tag_pairs = [
+        (recipe_id, tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in generator.sample(range(tags), generator.randint(0, 3))
+    ]
+    return recipe_ids, sorted(ingredient_pairs), tag_pairs
+
+
+def assert_matches_brute_force(index, recipe_ids, ingredient_pairs,
+                               tag_pairs):
+    features, expected = brute_force(
+        recipe_ids, ingredient_pairs, tag_pairs, K)
+    neighbours = index.neighbours(recipe_ids, K)
+    for recipe_id in recipe_ids:
+        # При равном сходстве допустим любой из рецептов, поэтому
+        # сравниваются списки сходства, а пары проверяются отдельно.
+        assert [score for score, _ in neighbours[recipe_id]] == (
+            pytest.approx([score for score, _ in expected[recipe_id]]))
+        own = features[recipe_id]
+        for score, other_id in neighbours[recipe_id]:
+            other = features[other_id]
+            assert other_id != recipe_id
+            assert score == pytest.approx(
+                len(own & other) / len(own | other))
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("max_postings", (3, 10, 1000))
+def test_neighbours_match_brute_force(seed, max_postings):
+    """Совпадение с полным перебором и для пар, у которых общие
+    только частые ингредиенты или теги."""
+    recipe_ids, ingredient_pairs, tag_pairs = catalog(seed)
+    index = SimilarityIndex(
+        recipe_ids, ingredient_pairs, tag_pairs, max_postings=max_postings)
+    assert_matches_brute_force(
+        index, recipe_ids, ingredient_pairs, tag_pairs)
+
+
+@pytest.mark.django_db
+def test_loaded_index_matches_brute_force(recipes):
+    recipe_ids = list(Recipe.objects.values_list("pk", flat=True))
+    ingredient_pairs = list(RecipeIngredients.objects.values_list(
+        "recipe_id", "ingredient_id"))
+    tag_pairs = list(Recipe.tags.through.objects.values_list(
+        "recipe_id", "tag_id"))
+    index = SimilarityIndex.load(max_postings=2)
+    assert_matches_brute_force(
+        index, recipe_ids, ingredient_pairs, tag_pairs)